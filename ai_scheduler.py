@@ -0,0 +1,49 @@
+# ai_scheduler.py
+from constants import AI_NEAR_DISTANCE, AI_FAR_DISTANCE
+
+TIER_NEAR = 0
+TIER_MID = 1
+TIER_FAR = 2
+TIER_INTERVALS = (1, 2, 4)  # ticks between updates of each tier
+
+# Level of detail for enemy AI: far enemies think less often and get the skipped time in one larger dt
+class AIScheduler:
+    def __init__(self, near_distance=AI_NEAR_DISTANCE, far_distance=AI_FAR_DISTANCE):
+        self.near_distance_sq = near_distance * near_distance
+        self.far_distance_sq = far_distance * far_distance
+        self.tick = 0
+        self.next_phase = 0
+        self.tier_counts = [0, 0, 0]  # enemies per tier in the current tick
+        self.updates = 0  # enemies updated in the current tick
+
+    # Start a new tick, call once before asking about the enemies
+    def begin_tick(self):
+        self.tick += 1
+        self.tier_counts = [0, 0, 0]
+        self.updates = 0
+
+    def tier(self, enemy, target_x, target_y):
+        dx = enemy.world_x - target_x
+        dy = enemy.world_y - target_y
+        distance_sq = dx * dx + dy * dy
+        if distance_sq < self.near_distance_sq:
+            return TIER_NEAR
+        if distance_sq < self.far_distance_sq:
+            return TIER_MID
+        return TIER_FAR
+
+    # Time the enemy should simulate this tick, 0 when it skips the tick
+    def due(self, enemy, target_x, target_y, dt):
+        if enemy.ai_phase is None:
+            # 错开相位，同一层的敌人分摊到不同的tick
+            enemy.ai_phase = self.next_phase
+            self.next_phase = (self.next_phase + 1) % TIER_INTERVALS[-1]
+        enemy.ai_pending_dt += dt
+        tier = self.tier(enemy, target_x, target_y)
+        self.tier_counts[tier] += 1
+        if (self.tick + enemy.ai_phase) % TIER_INTERVALS[tier]:
+            return 0
+        pending = enemy.ai_pending_dt
+        enemy.ai_pending_dt = 0.0
+        self.updates += 1
+        return pending
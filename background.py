@@ -0,0 +1,41 @@
+# background.py
+import pygame
+
+# Cache of pre-scaled backgrounds and large sprites in display format
+class BackgroundCache:
+    def __init__(self):
+        self.scaled = {}
+
+    # Get an image scaled to size, scaling it only the first time
+    def get_scaled(self, image, size):
+        key = (image, size)
+        surface = self.scaled.get(key)
+        if surface is None:
+            if image.get_size() == size:
+                # already loaded at the drawn size and in display format by load.py, keep no second copy
+                self.scaled[key] = image
+                return image
+            surface = pygame.transform.scale(image, size)
+            # keep the surface in the display pixel format so blits need no conversion
+            if pygame.display.get_surface() is not None:
+                if image.get_flags() & pygame.SRCALPHA:
+                    surface = surface.convert_alpha()
+                else:
+                    surface = surface.convert()
+            self.scaled[key] = surface
+        return surface
+
+    # Blit only the part of surface that is inside the window, pos is its top-left on screen
+    def blit_viewport(self, win, surface, pos):
+        dest = surface.get_rect(topleft=(int(pos[0]), int(pos[1])))
+        visible = dest.clip(win.get_clip())
+        if visible.width == 0 or visible.height == 0:
+            return None
+        area = visible.move(-dest.x, -dest.y)
+        return win.blit(surface, visible.topleft, area)
+
+    def clear(self):
+        self.scaled.clear()
+
+# global background cache instance
+background_cache = BackgroundCache()
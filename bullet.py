@@ -1,21 +1,25 @@
 # bullet.py
 import pygame
 import math
-from constants import BULLET_SPEED, SHOOT_COOLDOWN, LAST_SHOT_TIME, BULLETS
+import numpy as np
+from constants import BULLET_SPEED, BULLET_RADIUS, SHOOT_COOLDOWN, BULLETS, BASE_TICK_RATE, SIM_TICK_RATE
+from bullet_pool import OWNER_PLAYER
 from enemy import MeleeEnemy, RangedEnemy, Boss
+from spatial_hash import SpatialHash
+from sprite_cache import rotation_cache
+from logger import get_logger
+
+log = get_logger("bullet")
 
 # 计算两点之间的距离
 def distance(x1, y1, x2, y2):
     return math.sqrt((x2 - x1) ** 2 + (y2 - y1) ** 2)
 
-# 检查子弹与实体的碰撞
-def check_collision(bullet, entity, collision_radius):
-    return distance(bullet["x"], bullet["y"], entity.world_x, entity.world_y) < collision_radius
-
 # shoot bullet
-def shoot_bullet(player, current_time, mouse_pos, speed_multiplier=1):
-    global LAST_SHOT_TIME
-    if current_time - LAST_SHOT_TIME >= SHOOT_COOLDOWN:
+def shoot_bullet(player, current_time, mouse_pos, speed_multiplier=1, bullets=None):
+    if bullets is None:
+        bullets = BULLETS
+    if current_time - player.last_shot_time >= SHOOT_COOLDOWN:
         # Calculate direction based on mouse position
         dx = mouse_pos[0] - player.screen_width // 2
         dy = mouse_pos[1] - player.screen_height // 2
@@ -24,19 +28,14 @@ def shoot_bullet(player, current_time, mouse_pos, speed_multiplier=1):
             # 先尝试消耗能量
             if player.use_energy(4):
                 direction = [dx / length, dy / length]
-                bullet = {
-                    "x": player.world_x,
-                    "y": player.world_y,
-                    "velocity": [direction[0] * BULLET_SPEED * speed_multiplier, 
-                                direction[1] * BULLET_SPEED * speed_multiplier],
-                    "angle": math.degrees(math.atan2(-dy, dx)),
-                    "spawn_time": current_time,
-                    "visible": True,
-                    "damage": 1 * player.damage_multiplier,  # 使用玩家的伤害倍数
-                    "collision_radius": 10  # 碰撞检测半径
-                }
-                BULLETS.append(bullet)
-                LAST_SHOT_TIME = current_time
+                bullets.spawn(player.world_x, player.world_y,
+                              direction[0] * BULLET_SPEED * speed_multiplier,
+                              direction[1] * BULLET_SPEED * speed_multiplier,
+                              math.degrees(math.atan2(-dy, dx)),
+                              1 * player.damage_multiplier,  # 使用玩家的伤害倍数
+                              BULLET_RADIUS,  # 碰撞检测半径
+                              OWNER_PLAYER, current_time)
+                player.last_shot_time = current_time
                 return True
             else:
                 from render import message_system
@@ -44,93 +43,109 @@ def shoot_bullet(player, current_time, mouse_pos, speed_multiplier=1):
                 return False
     return False
 
+# 敌人的空间哈希，每帧重建
+enemy_hash = SpatialHash()
+
+# 击杀不同敌人获得的经验
+def experience_for(enemy):
+    if isinstance(enemy, MeleeEnemy):
+        return 1  # 击杀近战敌人获得1点经验
+    elif isinstance(enemy, RangedEnemy):
+        return 3  # 击杀远程敌人获得3点经验
+    elif isinstance(enemy, Boss):
+        return 10  # 击杀Boss获得10点经验
+    return 0
+
 # update bullets
-def update_bullets(bullets, world_width, world_height, current_time, player, player_image, bullet_image, start_hall=None, in_start_hall=False, enemies=None):
-    # 更新所有子弹
-    for bullet in bullets[:]:
-        # 更新子弹位置
-        bullet["x"] += bullet["velocity"][0]
-        bullet["y"] += bullet["velocity"][1]
-        
-        # 检查子弹是否在走廊安全区域内
-        in_corridor = False
-        if not in_start_hall and "world" in bullet:  # 确保bullet有world属性
-            current_area = bullet["world"].get_current_area(bullet["x"], bullet["y"])
-            if isinstance(current_area, str) and "corridor" in current_area:
-                # 如果子弹进入走廊，移除它
-                bullets.remove(bullet)
-                continue
+def update_bullets(bullets, world_width, world_height, current_time, player, player_image, bullet_image, start_hall=None, in_start_hall=False, enemies=None, world=None, dt=1.0 / SIM_TICK_RATE, collision_map=None):
+    if len(bullets) == 0:
+        return False
 
-        # 检查子弹是否超出边界
-        if in_start_hall:
-            if start_hall and not start_hall.is_valid_position(bullet["x"], bullet["y"]):
-                bullets.remove(bullet)
-                continue
-        else:
-            if (bullet["x"] < 0 or bullet["x"] > world_width or
-                bullet["y"] < 0 or bullet["y"] > world_height):
-                bullets.remove(bullet)
-                continue
-        
-        # 检查子弹是否击中玩家（仅对敌人子弹）
-        if enemies is None:  # 这是敌人子弹
-            # 确保子弹有必要的属性
-            if "collision_radius" not in bullet:
-                bullet["collision_radius"] = 10  # 默认碰撞半径
-            if "damage" not in bullet:
-                bullet["damage"] = 2  # 默认伤害值
-            
-            # 计算玩家和子弹之间的距离
-            dx = bullet["x"] - player.world_x
-            dy = bullet["y"] - player.world_y
-            distance = (dx ** 2 + dy ** 2) ** 0.5
-            
-            # 检查碰撞
-            if distance < bullet["collision_radius"] + player.collision_radius:
-                if not player.take_damage(bullet["damage"]):
-                    print("Player defeated by enemy bullet")
-                    return True  # 返回True表示玩家死亡
-                bullet["visible"] = False
-                continue
-        
-        # 检查子弹是否击中敌人（仅对玩家子弹）
-        if enemies:
-            for enemy in enemies[:]:
-                if check_collision(bullet, enemy, bullet["collision_radius"] + enemy.collision_radius):
-                    enemy.take_damage(bullet["damage"])
+    # 更新所有子弹位置（速度以BASE_TICK_RATE下每帧像素计）
+    bullets.move(dt * BASE_TICK_RATE)
+    n = len(bullets)
+    x = bullets.x[:n]
+    y = bullets.y[:n]
+    alive = bullets.alive[:n]
+
+    # 检查子弹是否进入走廊安全区域
+    if not in_start_hall and world is not None:
+        live = np.flatnonzero(alive)
+        alive[live[world.corridor_mask(x[live], y[live])]] = False
+
+    # 检查子弹是否超出边界或击中墙壁（碰撞图外部也算墙壁）
+    if collision_map is None and in_start_hall and start_hall:
+        collision_map = start_hall.collision_map
+    if collision_map is not None:
+        live = np.flatnonzero(alive)
+        alive[live[collision_map.solid_mask(x[live], y[live])]] = False
+    else:
+        bullets.kill_outside(0, 0, world_width, world_height)
+
+    # 检查子弹是否击中玩家（仅对敌人子弹）
+    if enemies is None:
+        dx = x - player.world_x
+        dy = y - player.world_y
+        reach = bullets.radius[:n] + player.collision_radius
+        for i in np.flatnonzero(alive & (dx * dx + dy * dy < reach * reach)):
+            alive[i] = False
+            if not player.take_damage(float(bullets.damage[i]), current_time):
+                log.info("Player defeated by enemy bullet")
+                bullets.compact()
+                return True  # 返回True表示玩家死亡
+
+    # 检查子弹是否击中敌人（仅对玩家子弹）
+    if enemies:
+        # 粗检测：按最大碰撞半径的2倍划分网格，敌人放入其碰撞圆覆盖的所有格子
+        max_bullet_radius = float(bullets.radius[:n].max())
+        enemy_hash.clear(2 * max(enemy.collision_radius for enemy in enemies))
+        for enemy in enemies:
+            if enemy.alive:
+                enemy_hash.insert(enemy, enemy.world_x, enemy.world_y, enemy.collision_radius + max_bullet_radius)
+
+        # 细检测：只检查所在格子里有敌人的子弹，用距离平方比较
+        keys = enemy_hash.keys_for(x, y)
+        for i in np.flatnonzero(alive & enemy_hash.occupied_mask(keys)):
+            bullet_x = x[i]
+            bullet_y = y[i]
+            for enemy in enemy_hash.cells[keys[i]]:
+                if not enemy.alive:
+                    continue
+                dx = bullet_x - enemy.world_x
+                dy = bullet_y - enemy.world_y
+                reach = bullets.radius[i] + enemy.collision_radius
+                if dx * dx + dy * dy < reach * reach:
+                    alive[i] = False
+                    enemy.take_damage(float(bullets.damage[i]))
                     if not enemy.alive:  # 如果敌人死亡
-                        if isinstance(enemy, MeleeEnemy):
-                            player.add_experience(1)  # 击杀近战敌人获得1点经验
-                        elif isinstance(enemy, RangedEnemy):
-                            player.add_experience(3)  # 击杀远程敌人获得3点经验
-                        elif isinstance(enemy, Boss):
-                            player.add_experience(10)  # 击杀Boss获得10点经验
-                    bullet["visible"] = False
+                        player.add_experience(experience_for(enemy))
                     break
-        
-        # 检查子弹是否击中墙壁
-        if in_start_hall and start_hall:
-            tile_size = start_hall.tile_size
-            grid_x = int(bullet["x"] // tile_size)
-            grid_y = int(bullet["y"] // tile_size)
-            
-            if 0 <= grid_x < start_hall.width and 0 <= grid_y < start_hall.height:
-                if start_hall.grid[grid_y][grid_x] == 1:  # 1代表墙壁
-                    bullet["visible"] = False
-        
-        if not bullet["visible"]:
-            bullets.remove(bullet)
+
+    bullets.compact()
     return False  # 玩家存活
 
 # draw bullets
-def draw_bullets(bullets, bullet_image, win, camera_offset, enemy_bullet_image=None):
+def draw_bullets(bullets, bullet_image, win, camera_offset, enemy_bullet_image=None, camera=None, alpha=1.0):
     offset_x, offset_y = camera_offset
-    for bullet in bullets:
-        if bullet["visible"]:
-            if enemy_bullet_image is None:  # 敌人子弹缺失时绘制红色圆点
-                pygame.draw.circle(win, (255, 0, 0), 
-                                  (int(bullet["x"] + offset_x), int(bullet["y"] + offset_y)), 5)
-            else:
-                rotated_bullet = pygame.transform.rotate(bullet_image if bullet_image else enemy_bullet_image, bullet["angle"])
-                bullet_rect = rotated_bullet.get_rect(center=(bullet["x"] + offset_x, bullet["y"] + offset_y))
-                win.blit(rotated_bullet, bullet_rect)
\ No newline at end of file
+    dirty_rects = []
+    indices = bullets.alive_indices()
+    x, y = bullets.render_positions(indices, alpha)
+    # 跳过相机视野外的子弹
+    if camera is not None:
+        rect = camera.visible_rect
+        visible = (x >= rect.left - 16) & (x < rect.right + 16) & (y >= rect.top - 16) & (y < rect.bottom + 16)
+        camera.count("bullets", int(np.count_nonzero(visible)), int(len(indices) - np.count_nonzero(visible)))
+        indices = indices[visible]
+        x = x[visible]
+        y = y[visible]
+    image = bullet_image if bullet_image else enemy_bullet_image
+    for i, bullet_x, bullet_y in zip(indices, x, y):
+        screen_x = bullet_x + offset_x
+        screen_y = bullet_y + offset_y
+        if enemy_bullet_image is None:  # 敌人子弹缺失时绘制红色圆点
+            dirty_rects.append(pygame.draw.circle(win, (255, 0, 0), (int(screen_x), int(screen_y)), 5))
+        else:
+            rotated_bullet = rotation_cache.get(image, bullets.angle[i])
+            bullet_rect = rotated_bullet.get_rect(center=(screen_x, screen_y))
+            dirty_rects.append(win.blit(rotated_bullet, bullet_rect))
+    return dirty_rects
@@ -0,0 +1,111 @@
+# bullet_pool.py
+import numpy as np
+
+# bullet owners
+OWNER_PLAYER = 0
+OWNER_ENEMY = 1
+
+# Structure-of-arrays bullet storage, live bullets are always packed in [0, count)
+class BulletPool:
+    def __init__(self, capacity=256):
+        self.count = 0
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        self.capacity = capacity
+        self.x = np.zeros(capacity, dtype=np.float64)
+        self.y = np.zeros(capacity, dtype=np.float64)
+        self.prev_x = np.zeros(capacity, dtype=np.float64)  # position before the last move, for render interpolation
+        self.prev_y = np.zeros(capacity, dtype=np.float64)
+        self.vx = np.zeros(capacity, dtype=np.float64)
+        self.vy = np.zeros(capacity, dtype=np.float64)
+        self.angle = np.zeros(capacity, dtype=np.float64)
+        self.damage = np.zeros(capacity, dtype=np.float64)
+        self.radius = np.zeros(capacity, dtype=np.float64)
+        self.owner = np.zeros(capacity, dtype=np.int8)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.spawn_time = np.zeros(capacity, dtype=np.int64)
+
+    def _arrays(self):
+        return (self.x, self.y, self.prev_x, self.prev_y, self.vx, self.vy, self.angle, self.damage,
+                self.radius, self.owner, self.alive, self.spawn_time)
+
+    # Double the capacity, keeping the live bullets
+    def _grow(self):
+        old = self._arrays()
+        self._allocate(self.capacity * 2)
+        for new_array, old_array in zip(self._arrays(), old):
+            new_array[:self.count] = old_array[:self.count]
+
+    def __len__(self):
+        return self.count
+
+    # Remove every bullet
+    def clear(self):
+        self.alive[:self.count] = False
+        self.count = 0
+
+    # Add a bullet and return its index
+    def spawn(self, x, y, vx, vy, angle, damage, radius, owner, spawn_time=0):
+        if self.count == self.capacity:
+            self._grow()
+        i = self.count
+        self.x[i] = x
+        self.y[i] = y
+        self.prev_x[i] = x
+        self.prev_y[i] = y
+        self.vx[i] = vx
+        self.vy[i] = vy
+        self.angle[i] = angle
+        self.damage[i] = damage
+        self.radius[i] = radius
+        self.owner[i] = owner
+        self.alive[i] = True
+        self.spawn_time[i] = spawn_time
+        self.count += 1
+        return i
+
+    # Advance every bullet by its velocity, scale is the number of base ticks to move
+    def move(self, scale=1.0):
+        n = self.count
+        self.prev_x[:n] = self.x[:n]
+        self.prev_y[:n] = self.y[:n]
+        self.x[:n] += self.vx[:n] * scale
+        self.y[:n] += self.vy[:n] * scale
+
+    # Positions of the given bullets between the previous and the current move, alpha in [0, 1]
+    def render_positions(self, indices, alpha=1.0):
+        x = self.x[indices]
+        y = self.y[indices]
+        if alpha != 1.0:
+            prev_x = self.prev_x[indices]
+            prev_y = self.prev_y[indices]
+            x = prev_x + (x - prev_x) * alpha
+            y = prev_y + (y - prev_y) * alpha
+        return x, y
+
+    # Kill bullets outside the rectangle [left, right] x [top, bottom]
+    def kill_outside(self, left, top, right, bottom):
+        n = self.count
+        x = self.x[:n]
+        y = self.y[:n]
+        self.alive[:n] &= (x >= left) & (x <= right) & (y >= top) & (y <= bottom)
+
+    # Pack live bullets into [0, count) by moving tail bullets into the holes
+    def compact(self):
+        n = self.count
+        alive = self.alive[:n]
+        live = int(np.count_nonzero(alive))
+        if live == n:
+            return
+        holes = np.flatnonzero(~alive[:live])
+        movers = np.flatnonzero(alive[live:n]) + live
+        if len(holes):
+            for array in self._arrays():
+                array[holes] = array[movers]
+        self.alive[live:n] = False
+        self.count = live
+
+    # Indices of the live bullets
+    def alive_indices(self):
+        return np.flatnonzero(self.alive[:self.count])
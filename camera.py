@@ -0,0 +1,38 @@
+# camera.py
+import pygame
+
+CULL_MARGIN = 64  # extra pixels around the screen that still count as visible
+
+# Camera following the player, knows which part of the world is on screen
+class Camera:
+    def __init__(self, screen_width, screen_height, margin=CULL_MARGIN):
+        self.screen_width = screen_width
+        self.screen_height = screen_height
+        self.margin = margin
+        self.offset = (0, 0)
+        self.visible_rect = pygame.Rect(-margin, -margin, screen_width + margin * 2, screen_height + margin * 2)
+        self.stats = {}  # category -> [visible, culled]
+
+    # Center the camera on a world position
+    def follow(self, world_x, world_y):
+        self.offset = (self.screen_width // 2 - world_x, self.screen_height // 2 - world_y)
+        self.visible_rect.topleft = (int(-self.offset[0]) - self.margin, int(-self.offset[1]) - self.margin)
+        return self.offset
+
+    # Check whether a circle in world coordinates is inside the visible rectangle
+    def is_visible(self, world_x, world_y, radius=0, category="entities"):
+        rect = self.visible_rect
+        visible = (rect.left - radius <= world_x < rect.right + radius and
+                   rect.top - radius <= world_y < rect.bottom + radius)
+        self.count(category, 1 if visible else 0, 0 if visible else 1)
+        return visible
+
+    # Add to the visible/culled counters of a category
+    def count(self, category, visible, culled):
+        counters = self.stats.setdefault(category, [0, 0])
+        counters[0] += visible
+        counters[1] += culled
+
+    # Clear the counters, call once per frame before drawing
+    def reset_stats(self):
+        self.stats.clear()
@@ -0,0 +1,312 @@
+# chunked_world.py
+import math
+import random
+import zlib
+from collections import OrderedDict
+import numpy as np
+import pygame
+from occupancy import OccupancyTable
+from world import World, CHUNK_TILES, REGION_WALL, REGION_CORRIDOR, REGION_ROOM, REGION_COLORS
+from logger import get_logger
+
+log = get_logger("chunked_world")
+
+CHUNK_SIZE = 64  # chunk edge length in tiles
+LOAD_RADIUS = 1  # chunks around the player kept loaded (1 = 3x3)
+EVICT_AFTER = 600  # updates a chunk outside the radius stays loaded after its last use
+MAX_COMPACT_CHUNKS = 4096  # evicted chunks kept compressed, older ones are generated again from the seed
+MAX_RENDER_PIECES = 128  # pre-rendered CHUNK_TILES x CHUNK_TILES pieces kept, keyed by quantised zoom
+DOOR_MARGIN = 4  # doors stay this far from chunk corners
+ROOM_SIZES = {"small": 5, "medium": 10, "large": 15}
+
+# rgb per region id, for turning a region grid into pixels in one step
+REGION_PALETTE = np.zeros((max(REGION_COLORS) + 1, 3), dtype=np.uint8)
+for _region, _color in REGION_COLORS.items():
+    REGION_PALETTE[_region] = _color
+
+# Position of the 2-tile door on the edge between two chunks, the same from both sides.
+# axis "x": edge between (ex, ey) and (ex + 1, ey); axis "y": edge between (ex, ey) and (ex, ey + 1)
+def door_offset(seed, axis, ex, ey):
+    return random.Random(f"{seed}:{axis}:{ex}:{ey}").randint(DOOR_MARGIN, CHUNK_SIZE - DOOR_MARGIN - 1)
+
+# 2格宽的L形走廊：先沿y1横向，再沿x2纵向，与World的走廊相同
+def carve_corridor(grid, x1, y1, x2, y2):
+    grid[max(0, y1 - 1):y1 + 1, max(0, min(x1, x2)):max(x1, x2) + 1] = 0
+    grid[max(0, min(y1, y2)):max(y1, y2) + 1, max(0, x2 - 1):x2 + 1] = 0
+
+# One streamed piece of the map, rooms and spawn points are in world tile coordinates
+class Chunk:
+    def __init__(self, chunk_x, chunk_y, grid, rooms, enemy_spawn_points, item_spawn_points, battery_spawn_points):
+        self.chunk_x = chunk_x
+        self.chunk_y = chunk_y
+        self.grid = grid  # (CHUNK_SIZE, CHUNK_SIZE) uint8, 1 = wall, 0 = floor
+        self.rooms = rooms
+        self.enemy_spawn_points = enemy_spawn_points
+        self.item_spawn_points = item_spawn_points
+        self.battery_spawn_points = battery_spawn_points
+        self.region_grid = None  # built on the first draw
+        self.last_used = 0
+
+    def build_region_grid(self):
+        region_grid = np.where(self.grid == 1, REGION_WALL, REGION_CORRIDOR).astype(np.uint8)
+        left = self.chunk_x * CHUNK_SIZE
+        top = self.chunk_y * CHUNK_SIZE
+        for x, y, w, h, _ in self.rooms:
+            region_grid[y - top:y - top + h, x - left:x - left + w] = REGION_ROOM
+        self.region_grid = region_grid
+        return region_grid
+
+    # Compressed form kept after eviction, a few hundred bytes instead of the full grids
+    def compact(self):
+        return (zlib.compress(self.grid.tobytes(), 1), self.rooms, self.enemy_spawn_points,
+                self.item_spawn_points, self.battery_spawn_points)
+
+    @classmethod
+    def from_compact(cls, chunk_x, chunk_y, data):
+        grid_bytes, rooms, enemy_spawn_points, item_spawn_points, battery_spawn_points = data
+        grid = np.frombuffer(zlib.decompress(grid_bytes), dtype=np.uint8).reshape(CHUNK_SIZE, CHUNK_SIZE).copy()
+        return cls(chunk_x, chunk_y, grid, rooms, enemy_spawn_points, item_spawn_points, battery_spawn_points)
+
+# Generate one chunk from the world seed alone: rooms, corridors between them and to the four edge doors, spawn points.
+# Neighbouring chunks derive the shared door from the same edge seed, so corridors line up without loading either side.
+def generate_chunk(seed, chunk_x, chunk_y):
+    rng = random.Random(f"{seed}:{chunk_x}:{chunk_y}")
+    size = CHUNK_SIZE
+    grid = np.ones((size, size), dtype=np.uint8)
+    occupancy = OccupancyTable(size, size)
+    left = chunk_x * size
+    top = chunk_y * size
+
+    rooms = []
+    for _ in range(rng.randint(3, 6)):
+        room_type = rng.choice(("small", "small", "medium", "medium", "large"))
+        w = h = ROOM_SIZES[room_type]
+        # 房间离边界至少2格，边界只由门打开
+        position = occupancy.place(rng, w, h, 1, 2, 2, size - w - 2, size - h - 2)
+        if position is None:
+            continue
+        x, y = position
+        grid[y:y + h, x:x + w] = 0
+        rooms.append((x, y, w, h, room_type))
+
+    centers = [(x + w // 2, y + h // 2) for x, y, w, h, _ in rooms] or [(size // 2, size // 2)]
+    for (x1, y1), (x2, y2) in zip(centers, centers[1:]):
+        carve_corridor(grid, x1, y1, x2, y2)
+
+    def nearest_center(x, y):
+        return min(centers, key=lambda center: (center[0] - x) ** 2 + (center[1] - y) ** 2)
+
+    # 东西方向的门先横向走，南北方向的门最后纵向走，只在门的位置打开边界
+    west = door_offset(seed, "x", chunk_x - 1, chunk_y)
+    east = door_offset(seed, "x", chunk_x, chunk_y)
+    north = door_offset(seed, "y", chunk_x, chunk_y - 1)
+    south = door_offset(seed, "y", chunk_x, chunk_y)
+    carve_corridor(grid, 0, west, *nearest_center(0, west))
+    carve_corridor(grid, size - 1, east, *nearest_center(size - 1, east))
+    carve_corridor(grid, *nearest_center(north, 0), north, 0)
+    carve_corridor(grid, *nearest_center(south, size - 1), south, size - 1)
+
+    enemy_spawn_points = []
+    item_spawn_points = []
+    battery_spawn_points = []
+    for x, y, w, h, room_type in rooms:
+        if room_type != "small":
+            for _ in range(2 if room_type == "medium" else 4):
+                enemy_spawn_points.append((left + x + rng.randint(1, w - 2), top + y + rng.randint(1, h - 2)))
+        if room_type == "large":
+            for _ in range(rng.randint(2, 3)):
+                battery_spawn_points.append((left + x + rng.randint(1, w - 2), top + y + rng.randint(1, h - 2)))
+        if rng.random() < 0.25:
+            item_spawn_points.append((left + x + rng.randint(1, w - 2), top + y + rng.randint(1, h - 2)))
+
+    rooms = [(left + x, top + y, w, h, room_type) for x, y, w, h, room_type in rooms]
+    return Chunk(chunk_x, chunk_y, grid, rooms, enemy_spawn_points, item_spawn_points, battery_spawn_points)
+
+# Unbounded world made of CHUNK_SIZE x CHUNK_SIZE chunks generated on demand from a seed.
+# Chunks around the player stay loaded, chunks left behind are compressed, so memory and generation
+# follow the explored area instead of the map size.
+class ChunkedWorld:
+    def __init__(self, seed=0, tile_size=32, load_radius=LOAD_RADIUS, evict_after=EVICT_AFTER):
+        self.seed = seed
+        self.tile_size = tile_size
+        self.load_radius = load_radius
+        self.evict_after = evict_after
+        self.chunks = {}  # (chunk_x, chunk_y) -> Chunk
+        self.compact_chunks = OrderedDict()  # (chunk_x, chunk_y) -> Chunk.compact(), least recently evicted first
+        self._render_cache = OrderedDict()  # (scale, chunk_x, chunk_y, piece_x, piece_y) -> Surface
+        self.clock = 0  # number of update() calls
+        self.generated = 0
+        self.restored = 0
+
+    # Chunk at chunk coordinates, loaded from the compact cache or generated if needed
+    def chunk(self, chunk_x, chunk_y):
+        key = (chunk_x, chunk_y)
+        chunk = self.chunks.get(key)
+        if chunk is None:
+            data = self.compact_chunks.pop(key, None)
+            if data is not None:
+                chunk = Chunk.from_compact(chunk_x, chunk_y, data)
+                self.restored += 1
+            else:
+                chunk = generate_chunk(self.seed, chunk_x, chunk_y)
+                self.generated += 1
+                log.debug("Generated chunk (%d, %d) with %d rooms", chunk_x, chunk_y, len(chunk.rooms))
+            self.chunks[key] = chunk
+        chunk.last_used = self.clock
+        return chunk
+
+    def chunk_at(self, x, y):
+        """Chunk containing a world position in pixels"""
+        return self.chunk(int(x // self.tile_size) // CHUNK_SIZE, int(y // self.tile_size) // CHUNK_SIZE)
+
+    # Stream chunks around a world position, call once per tick with the player position
+    def update(self, x, y):
+        self.clock += 1
+        center_x = int(x // self.tile_size) // CHUNK_SIZE
+        center_y = int(y // self.tile_size) // CHUNK_SIZE
+        radius = self.load_radius
+        for chunk_y in range(center_y - radius, center_y + radius + 1):
+            for chunk_x in range(center_x - radius, center_x + radius + 1):
+                self.chunk(chunk_x, chunk_y)
+        for key, chunk in list(self.chunks.items()):
+            if self.clock - chunk.last_used > self.evict_after:
+                self.evict(key)
+
+    # Move a loaded chunk to the compact cache
+    def evict(self, key):
+        chunk = self.chunks.pop(key)
+        self.compact_chunks[key] = chunk.compact()
+        if len(self.compact_chunks) > MAX_COMPACT_CHUNKS:
+            self.compact_chunks.popitem(last=False)  # 丢掉的区块之后按种子重新生成
+        for render_key in [render_key for render_key in self._render_cache if render_key[1:3] == key]:
+            del self._render_cache[render_key]
+
+    def is_wall(self, x, y):
+        """Whether a tile (world tile coordinates, may be negative) is a wall"""
+        chunk = self.chunk(x // CHUNK_SIZE, y // CHUNK_SIZE)
+        return chunk.grid[y % CHUNK_SIZE, x % CHUNK_SIZE] == 1
+
+    def is_solid(self, x, y):
+        """Whether a world position in pixels is inside a wall"""
+        return self.is_wall(int(x // self.tile_size), int(y // self.tile_size))
+
+    def get_start_position(self):
+        chunk = self.chunk(0, 0)
+        if not chunk.rooms:
+            log.warning("No rooms in the start chunk, using the chunk center")
+            return CHUNK_SIZE * self.tile_size // 2, CHUNK_SIZE * self.tile_size // 2
+        x, y, w, h, _ = chunk.rooms[0]
+        return (x + w // 2) * self.tile_size, (y + h // 2) * self.tile_size
+
+    # Memory and generation counters
+    def stats(self):
+        loaded_bytes = sum(chunk.grid.nbytes + (chunk.region_grid.nbytes if chunk.region_grid is not None else 0)
+                           for chunk in self.chunks.values())
+        return {
+            "loaded": len(self.chunks),
+            "compact": len(self.compact_chunks),
+            "generated": self.generated,
+            "restored": self.restored,
+            "loaded_bytes": loaded_bytes,
+            "compact_bytes": sum(len(data[0]) for data in self.compact_chunks.values()),
+        }
+
+    def _render_piece(self, chunk, piece_x, piece_y, scale):
+        region_grid = chunk.region_grid if chunk.region_grid is not None else chunk.build_region_grid()
+        regions = region_grid[piece_y * CHUNK_TILES:(piece_y + 1) * CHUNK_TILES,
+                              piece_x * CHUNK_TILES:(piece_x + 1) * CHUNK_TILES]
+        # 格子边界由世界坐标取整得到，与World相同；每个像素查它所在的格子，一次写入整块
+        tile_px = self.tile_size * scale
+        first_x = chunk.chunk_x * CHUNK_SIZE + piece_x * CHUNK_TILES
+        first_y = chunk.chunk_y * CHUNK_SIZE + piece_y * CHUNK_TILES
+        xs = np.round((first_x + np.arange(CHUNK_TILES + 1)) * tile_px).astype(np.intp)
+        ys = np.round((first_y + np.arange(CHUNK_TILES + 1)) * tile_px).astype(np.intp)
+        xs -= xs[0]
+        ys -= ys[0]
+        columns = np.searchsorted(xs, np.arange(xs[-1]), side="right") - 1
+        rows = np.searchsorted(ys, np.arange(ys[-1]), side="right") - 1
+        surface = pygame.Surface((int(xs[-1]), int(ys[-1])))
+        pygame.surfarray.blit_array(surface, REGION_PALETTE[regions[rows[None, :], columns[:, None]]])
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert()
+        for x in xs:
+            pygame.draw.line(surface, (50, 50, 50), (int(x), 0), (int(x), int(ys[-1])))
+        for y in ys:
+            pygame.draw.line(surface, (50, 50, 50), (0, int(y)), (int(xs[-1]), int(y)))
+        return surface
+
+    def _get_piece(self, chunk, piece_x, piece_y, scale):
+        key = (scale, chunk.chunk_x, chunk.chunk_y, piece_x, piece_y)
+        surface = self._render_cache.get(key)
+        if surface is None:
+            surface = self._render_piece(chunk, piece_x, piece_y, scale)
+            self._render_cache[key] = surface
+            if len(self._render_cache) > MAX_RENDER_PIECES:
+                self._render_cache.popitem(last=False)
+        else:
+            self._render_cache.move_to_end(key)
+        return surface
+
+    def draw(self, win, camera_offset, scale=1.0, camera=None):
+        offset_x, offset_y = int(camera_offset[0]), int(camera_offset[1])
+        scale = World.quantize_scale(scale)
+        tile_px = self.tile_size * scale
+        piece_px = CHUNK_TILES * tile_px  # float, piece origins are rounded from it
+        pieces_per_chunk = CHUNK_SIZE // CHUNK_TILES
+
+        # only the pieces that intersect the viewport, the world has no edges to clamp to
+        view_width, view_height = win.get_size()
+        first_x = math.floor(-offset_x / piece_px)
+        first_y = math.floor(-offset_y / piece_px)
+        last_x = math.floor((view_width - 1 - offset_x) / piece_px)
+        last_y = math.floor((view_height - 1 - offset_y) / piece_px)
+        visible_chunks = set()
+        for piece_y in range(first_y, last_y + 1):
+            for piece_x in range(first_x, last_x + 1):
+                chunk = self.chunk(piece_x // pieces_per_chunk, piece_y // pieces_per_chunk)
+                visible_chunks.add(chunk)
+                surface = self._get_piece(chunk, piece_x % pieces_per_chunk, piece_y % pieces_per_chunk, scale)
+                win.blit(surface, (round(piece_x * piece_px) + offset_x, round(piece_y * piece_px) + offset_y))
+        if camera is not None:
+            # 只统计与视口相交的区块里被检测的块，不随缓存大小变化
+            visible_pieces = (last_x - first_x + 1) * (last_y - first_y + 1)
+            camera.count("world chunks", visible_pieces, len(visible_chunks) * pieces_per_chunk ** 2 - visible_pieces)
+
+        # spawn markers are culled one by one against the view like entities
+        visible_markers = 0
+        culled_markers = 0
+        for chunk in visible_chunks:
+            for color, radius, points in (((255, 0, 0), 4, chunk.enemy_spawn_points),
+                                          ((0, 255, 0), 4, chunk.item_spawn_points),
+                                          ((255, 255, 0), 4, chunk.battery_spawn_points)):
+                r = int(radius * scale)
+                for mx, my in points:
+                    x = round(mx * tile_px) + offset_x
+                    y = round(my * tile_px) + offset_y
+                    if -r <= x < view_width + r and -r <= y < view_height + r:
+                        pygame.draw.circle(win, color, (x, y), r)
+                        visible_markers += 1
+                    else:
+                        culled_markers += 1
+        if camera is not None:
+            camera.count("world markers", visible_markers, culled_markers)
+
+# Headless benchmark: walk far across the map and report how much stays in memory
+if __name__ == "__main__":
+    import time
+    world = ChunkedWorld(seed=1)
+    x, y = world.get_start_position()
+    chunk_px = CHUNK_SIZE * world.tile_size
+    step = 7.0 * 4  # a few player moves per update
+    start = time.perf_counter()
+    updates = 0
+    while y < chunk_px * 200:
+        world.update(x, y)
+        x += step * 0.5
+        y += step
+        updates += 1
+    elapsed = time.perf_counter() - start
+    stats = world.stats()
+    print(f"{updates} updates over {int(y // chunk_px)} chunks in {elapsed:.2f}s, "
+          f"{elapsed / max(1, stats['generated']) * 1000:.2f} ms per generated chunk")
+    print(stats)
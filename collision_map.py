@@ -0,0 +1,125 @@
+# collision_map.py
+import math
+import numpy as np
+
+# One byte per tile (1 = solid) in row-major order, shared by scalar and vectorized queries.
+# Everything outside the map counts as solid.
+class CollisionMap:
+    def __init__(self, width, height, tile_size, bits):
+        self.width = width
+        self.height = height
+        self.tile_size = tile_size
+        self.bits = bits  # bytearray, index = y * width + x
+        self.solid = np.frombuffer(bits, dtype=np.uint8).reshape(height, width)  # numpy view of the same bytes
+        self.pixel_width = width * tile_size
+        self.pixel_height = height * tile_size
+        self.version = 0  # bumped on every wall change, caches built from the walls compare it
+
+    # Build the map from a tile grid (StartHall or World, 1 = wall)
+    @classmethod
+    def from_grid(cls, nav_grid):
+        bits = bytearray((np.asarray(nav_grid.grid) == 1).astype(np.uint8).tobytes())
+        return cls(nav_grid.width, nav_grid.height, nav_grid.tile_size, bits)
+
+    # Change one tile
+    def set_tile(self, tile_x, tile_y, solid):
+        value = 1 if solid else 0
+        index = tile_y * self.width + tile_x
+        if self.bits[index] != value:
+            self.bits[index] = value
+            self.version += 1
+
+    def is_solid_tile(self, tile_x, tile_y):
+        if 0 <= tile_x < self.width and 0 <= tile_y < self.height:
+            return self.bits[tile_y * self.width + tile_x] == 1
+        return True
+
+    # Whether a world position is inside a solid tile
+    def is_solid(self, x, y):
+        tile_size = self.tile_size
+        return self.is_solid_tile(int(x // tile_size), int(y // tile_size))
+
+    # Solid flag of many world positions at once
+    def solid_mask(self, x, y):
+        tile_x = np.floor_divide(x, self.tile_size).astype(np.intp)
+        tile_y = np.floor_divide(y, self.tile_size).astype(np.intp)
+        inside = (tile_x >= 0) & (tile_x < self.width) & (tile_y >= 0) & (tile_y < self.height)
+        mask = ~inside
+        mask[inside] = self.solid[tile_y[inside], tile_x[inside]] == 1
+        return mask
+
+    # Whether a circle overlaps any solid tile
+    def circle_hits(self, x, y, radius):
+        tile_size = self.tile_size
+        radius_sq = radius * radius
+        for tile_y in range(int((y - radius) // tile_size), int((y + radius) // tile_size) + 1):
+            top = tile_y * tile_size
+            nearest_y = min(max(y, top), top + tile_size)
+            for tile_x in range(int((x - radius) // tile_size), int((x + radius) // tile_size) + 1):
+                if not self.is_solid_tile(tile_x, tile_y):
+                    continue
+                left = tile_x * tile_size
+                nearest_x = min(max(x, left), left + tile_size)
+                if (x - nearest_x) ** 2 + (y - nearest_y) ** 2 < radius_sq:
+                    return True
+        return False
+
+    # How deep a circle reaches into the solid tiles, 0 when it touches none
+    def penetration(self, x, y, radius):
+        tile_size = self.tile_size
+        depth = 0.0
+        for tile_y in range(int((y - radius) // tile_size), int((y + radius) // tile_size) + 1):
+            top = tile_y * tile_size
+            nearest_y = min(max(y, top), top + tile_size)
+            for tile_x in range(int((x - radius) // tile_size), int((x + radius) // tile_size) + 1):
+                if not self.is_solid_tile(tile_x, tile_y):
+                    continue
+                left = tile_x * tile_size
+                nearest_x = min(max(x, left), left + tile_size)
+                if nearest_x == x and nearest_y == y:
+                    # 圆心在墙格里面时再加上到格子边缘的距离，越靠近出口越浅
+                    inside = min(x - left, left + tile_size - x, y - top, top + tile_size - y)
+                    depth = max(depth, radius + inside)
+                else:
+                    depth = max(depth, radius - math.hypot(x - nearest_x, y - nearest_y))
+        return depth
+
+    # Move a circle by (dx, dy), stopping at walls and sliding along them.
+    # The move is split into steps of at most half a tile so fast movers cannot tunnel through walls.
+    def move_circle(self, x, y, dx, dy, radius):
+        depth = self.penetration(x, y, radius)
+        if depth > 0:
+            # 已经卡在墙里时只允许减小重叠的移动，不能借此穿墙
+            for move_x, move_y in ((dx, dy), (dx, 0.0), (0.0, dy)):
+                if (move_x or move_y) and self.penetration(x + move_x, y + move_y, radius) < depth:
+                    return (x + move_x, y + move_y)
+            return (x, y)
+        steps = max(1, math.ceil(max(abs(dx), abs(dy)) / (self.tile_size * 0.5)))
+        step_x = dx / steps
+        step_y = dy / steps
+        for _ in range(steps):
+            if step_x:
+                if self.circle_hits(x + step_x, y, radius):
+                    x += step_x * self._contact_fraction(x, y, step_x, 0.0, radius)
+                    step_x = 0.0
+                else:
+                    x += step_x
+            if step_y:
+                if self.circle_hits(x, y + step_y, radius):
+                    y += step_y * self._contact_fraction(x, y, 0.0, step_y, radius)
+                    step_y = 0.0
+                else:
+                    y += step_y
+            if not step_x and not step_y:
+                break
+        return (x, y)
+
+    # Largest part of a blocked step that stays clear, found by halving
+    def _contact_fraction(self, x, y, step_x, step_y, radius):
+        moved = 0.0
+        fraction = 0.5
+        for _ in range(4):
+            if not self.circle_hits(x + step_x * (moved + fraction), y + step_y * (moved + fraction), radius):
+                moved += fraction
+            fraction *= 0.5
+        return moved
@@ -1,22 +1,36 @@
 # constants.py
+from bullet_pool import BulletPool
 
 # global constants
 PLAYER_X = 400.0
 PLAYER_Y = 300.0
+BASE_TICK_RATE = 60  # MOVE_SPEED and bullet speeds are pixels per tick at this rate
+SIM_TICK_RATE = 60  # fixed simulation rate (ticks/s)
+MAX_TICKS_PER_FRAME = 5  # simulation ticks allowed per rendered frame before dropping time
+AI_NEAR_DISTANCE = 1100  # enemies closer than this (px) think every tick, about the visible screen
+AI_FAR_DISTANCE = 2200  # enemies farther than this think every 4th tick, the rest every 2nd
 MOVE_SPEED = 7.0  # make sure defines MOVE_SPEED there
-BULLET_SPEED = 9.5 # bullet speed (pixels/s)
+BULLET_SPEED = 9.5 # bullet speed (pixels/tick)
 ENEMY_BULLET_SPEED = 8.0
+ENEMY_BULLET_DAMAGE = 2  # 敌人子弹默认伤害
+BULLET_RADIUS = 10  # bullet collision radius
+CORRIDOR_WIDTH = 200  # world_beta corridor width, also the size its background is drawn at
+MAX_ENEMY_BULLETS = 4096  # upper bound of enemy bullets alive at once
 PLAYER_BULLET_DAMAGE = 10  # 玩家子弹默认伤害
 SHOOT_COOLDOWN = 250  # shoot cooldown (ms)
 F_KEY_COOLDOWN = 15000  # F key cooldown (ms)
 ENERGY_RECOVERY_RATE = 2  # energy recovery rate (energy/s)
 GAME_OVER_DELAY = 1500  # game over delay (ms)
+HIT_TINT = (255, 100, 100, 128)  # enemy hit flash tint (RGBA multiply)
+WARNING_TINT = (255, 255, 0, 128)  # boss burst warning tint (RGBA multiply)
+DIRTY_RECT_MODE = False  # update only changed screen areas while the camera is still
+SHOW_STATS_OVERLAY = False  # show culling and cache statistics (toggle with F3)
 HALL_WIDTH = None
 HALL_HEIGHT = None
 
 # global variables
-BULLETS = [] # list of bullets
+BULLETS = BulletPool() # pool of player bullets
 ENEMIES = []
-ENEMY_BULLETS = []
+ENEMY_BULLETS = BulletPool() # pool of enemy bullets
 LAST_SHOT_TIME = 0 # last time bullet was shot
 LAST_F_KEY_TIME = 0 # last time F key was pressed
\ No newline at end of file
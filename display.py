@@ -0,0 +1,28 @@
+# display.py
+import pygame
+
+# Pushes finished frames to the screen, either as a full flip or as dirty rectangles
+class DisplayUpdater:
+    def __init__(self, dirty_rect_mode=False):
+        self.dirty_rect_mode = dirty_rect_mode
+        self.previous_rects = []
+        self.last_camera_offset = None
+        self.full_update = True
+
+    # Force the next present to flip the whole screen
+    def request_full_update(self):
+        self.full_update = True
+
+    # Show the frame, rects are the areas drawn this frame
+    def present(self, rects, camera_offset=None):
+        rects = [rect for rect in rects if rect]
+        if (not self.dirty_rect_mode or self.full_update or
+                camera_offset != self.last_camera_offset):
+            # the camera moved, so every pixel on screen may have changed
+            pygame.display.flip()
+        else:
+            # last frame's rects are included so anything that moved or disappeared is erased
+            pygame.display.update(self.previous_rects + rects)
+        self.previous_rects = rects
+        self.last_camera_offset = camera_offset
+        self.full_update = False
@@ -2,12 +2,20 @@
 import pygame
 import math
 import random
-from constants import ENEMY_BULLET_SPEED
+from constants import ENEMY_BULLET_SPEED, ENEMY_BULLET_DAMAGE, BULLET_RADIUS, MAX_ENEMY_BULLETS, HIT_TINT, WARNING_TINT
+from bullet_pool import OWNER_ENEMY
+from sprite_cache import rotation_cache, tint_cache
+from logger import get_logger
+
+log = get_logger("enemy")
 
 class Enemy:
-    def __init__(self, world_x, world_y, images, image_key, hp, speed, damage=10, placeholder_color=(255, 255, 255)):
+    def __init__(self, world_x, world_y, images, image_key, hp, speed, damage=10, placeholder_color=(255, 255, 255), rng=None):
+        self.rng = rng if rng is not None else random  # 随机数来源，传入带种子的random.Random可复现行为
         self.world_x = world_x
         self.world_y = world_y
+        self.prev_x = world_x  # 上一次模拟时的位置，用于渲染插值
+        self.prev_y = world_y
         self.hp = hp
         self.max_hp = hp
         self.speed = speed
@@ -31,9 +39,12 @@ class Enemy:
         self.state = "idle"
         self.hit_effect_time = 0
         self.hit_effect_duration = 100  # 受击变红 100ms
+        self.can_see_player = True  # 视线是否被墙挡住，由模拟批量更新
+        self.ai_phase = None  # AI调度的相位，首次调度时分配
+        self.ai_pending_dt = 0.0  # 跳过的tick累积的时间（秒）
 
-    def update(self, dt, player, world_width, world_height, start_hall=None, in_start_hall=False):
-        """虚方法，子类实现具体更新逻辑"""
+    def update(self, dt, player, world_width, world_height, start_hall=None, in_start_hall=False, collision_map=None):
+        """虚方法，子类实现具体更新逻辑；collision_map为当前关卡的碰撞图，在大厅中默认使用大厅的碰撞图"""
         if not self.alive:
             return
         # 受击效果
@@ -43,35 +54,46 @@ class Enemy:
                 self.image = self._apply_hit_effect()
         else:
             if not self.use_placeholder:
-                self.image = pygame.transform.rotate(self.image_original, self.angle)
+                self.image = rotation_cache.get(self.image_original, self.angle)
         # 更新位置并检查墙壁碰撞
-        new_x = self.world_x + self.direction[0] * self.speed * dt
-        new_y = self.world_y + self.direction[1] * self.speed * dt
-        if in_start_hall and start_hall:
-            tile_size = start_hall.tile_size
-            grid_x = int(new_x // tile_size)
-            grid_y = int(new_y // tile_size)
-            if 0 <= grid_x < start_hall.width and 0 <= grid_y < start_hall.height:
-                if start_hall.grid[grid_y][grid_x] == 1:  # 墙壁
-                    new_x, new_y = self.world_x, self.world_y  # 取消移动
+        self.prev_x = self.world_x
+        self.prev_y = self.world_y
+        move_x = self.direction[0] * self.speed * dt
+        move_y = self.direction[1] * self.speed * dt
+        if collision_map is None and in_start_hall and start_hall:
+            collision_map = start_hall.collision_map
+        if collision_map is not None:
+            new_x, new_y = collision_map.move_circle(self.world_x, self.world_y, move_x, move_y,
+                                                     self.movement_radius(collision_map.tile_size))  # 沿墙滑动
+        else:
+            new_x, new_y = self.world_x + move_x, self.world_y + move_y
         self.world_x = max(0, min(new_x, world_width))
         self.world_y = max(0, min(new_y, world_height))
         self.rect.center = (self.world_x, self.world_y)
 
-    def draw(self, win, camera_offset):
-        """绘制敌人，考虑相机偏移"""
+    def movement_radius(self, tile_size):
+        """与墙壁碰撞用的半径：不超过半条走廊宽（两格），大体型敌人也能通过走廊；受击判定仍用collision_radius"""
+        return min(self.collision_radius, tile_size - 2)
+
+    def draw(self, win, camera_offset, camera=None, alpha=1.0):
+        """绘制敌人，考虑相机偏移，返回绘制的矩形区域；不在相机视野内的敌人跳过绘制
+        alpha为两次模拟之间的插值系数"""
         if not self.alive:
-            return
-        screen_x = self.world_x + camera_offset[0]
-        screen_y = self.world_y + camera_offset[1]
+            return None
+        render_x = self.prev_x + (self.world_x - self.prev_x) * alpha
+        render_y = self.prev_y + (self.world_y - self.prev_y) * alpha
+        screen_x = render_x + camera_offset[0]
+        screen_y = render_y + camera_offset[1]
         self.rect.center = (screen_x, screen_y)
+        if camera is not None and not camera.is_visible(render_x, render_y, max(self.rect.size) // 2, "enemies"):
+            return None
         if self.use_placeholder:
-            pygame.draw.rect(win, self.placeholder_color, 
+            return pygame.draw.rect(win, self.placeholder_color, 
                              (screen_x - self.placeholder_size[0] // 2, 
                               screen_y - self.placeholder_size[1] // 2, 
                               self.placeholder_size[0], self.placeholder_size[1]))
         else:
-            win.blit(self.image, self.rect)
+            return win.blit(self.image, self.rect)
 
     def take_damage(self, damage):
         """处理敌人受损"""
@@ -83,28 +105,24 @@ class Enemy:
             self.alive = False
 
     def _apply_hit_effect(self):
-        """应用受击效果（图像变红）"""
-        red_tint = pygame.Surface(self.image_original.get_size(), pygame.SRCALPHA)
-        red_tint.fill((255, 100, 100, 128))
-        tinted_image = self.image_original.copy()
-        tinted_image.blit(red_tint, (0, 0), special_flags=pygame.BLEND_RGBA_MULT)
-        return pygame.transform.rotate(tinted_image, self.angle)
+        """应用受击效果（图像变红），使用缓存的染色旋转帧"""
+        return tint_cache.get_rotated(self.image_original, HIT_TINT, self.angle)
 
 class RangedEnemy(Enemy):
-    def __init__(self, world_x, world_y, images):
+    def __init__(self, world_x, world_y, images, rng=None):
         super().__init__(world_x, world_y, images, "ranged_enemy", hp=6, speed=80, 
-                         damage=5, placeholder_color=(0, 255, 0))  # 绿色矩形
+                         damage=5, placeholder_color=(0, 255, 0), rng=rng)  # 绿色矩形
         self.collision_radius = 24  # 远程敌人碰撞半径较小
         self.min_distance = 200
         self.shoot_cooldown = 2000
         self.last_shot_time = 0
-        self.shoot_damage = 2
+        self.shoot_damage = ENEMY_BULLET_DAMAGE
         self.patrol_timer = 0
-        self.patrol_duration = random.uniform(2000, 5000)
-        self.patrol_direction = [random.uniform(-1, 1), random.uniform(-1, 1)]
+        self.patrol_duration = self.rng.uniform(2000, 5000)
+        self.patrol_direction = [self.rng.uniform(-1, 1), self.rng.uniform(-1, 1)]
 
-    def update(self, dt, player, world_width, world_height, enemy_bullets, current_time, start_hall=None, in_start_hall=False):
-        """更新远程敌人：巡逻、追逐、射击"""
+    def update(self, dt, player, world_width, world_height, enemy_bullets, current_time, start_hall=None, in_start_hall=False, flow_field=None, collision_map=None):
+        """更新远程敌人：巡逻、追逐、射击（远程敌人不追击，忽略flow_field）"""
         if not self.alive:
             return
         dx = player.world_x - self.world_x
@@ -119,38 +137,32 @@ class RangedEnemy(Enemy):
         if self.state == "patrol":
             self.patrol_timer += dt * 1000
             if self.patrol_timer >= self.patrol_duration:
-                self.patrol_direction = [random.uniform(-1, 1), random.uniform(-1, 1)]
+                self.patrol_direction = [self.rng.uniform(-1, 1), self.rng.uniform(-1, 1)]
                 self.patrol_timer = 0
-                self.patrol_duration = random.uniform(2000, 5000)
+                self.patrol_duration = self.rng.uniform(2000, 5000)
             length = (self.patrol_direction[0] ** 2 + self.patrol_direction[1] ** 2) ** 0.5
             self.direction = [self.patrol_direction[0] / length, self.patrol_direction[1] / length] if length > 0 else [0, 0]
         elif self.state == "retreat":
-            self.direction = [-dx / distance, -dy / distance] if distance > 0 else [random.uniform(-1, 1), random.uniform(-1, 1)]
+            self.direction = [-dx / distance, -dy / distance] if distance > 0 else [self.rng.uniform(-1, 1), self.rng.uniform(-1, 1)]
         elif self.state == "attack":
             self.direction = [0, 0]
-            if distance > 0 and current_time - self.last_shot_time >= self.shoot_cooldown:
+            if distance > 0 and self.can_see_player and current_time - self.last_shot_time >= self.shoot_cooldown:
                 self._shoot_bullet(enemy_bullets, dx, dy, distance, current_time)
         self.angle = math.degrees(math.atan2(-dy, dx))
-        super().update(dt, player, world_width, world_height, start_hall, in_start_hall)
+        super().update(dt, player, world_width, world_height, start_hall, in_start_hall, collision_map)
 
     def _shoot_bullet(self, enemy_bullets, dx, dy, distance, current_time):
         """发射子弹"""
-        if len(enemy_bullets) < 50:
-            bullet = {
-                "x": self.world_x,
-                "y": self.world_y,
-                "velocity": [dx / distance * ENEMY_BULLET_SPEED, dy / distance * ENEMY_BULLET_SPEED],
-                "angle": self.angle,
-                "spawn_time": current_time,
-                "visible": True
-            }
-            enemy_bullets.append(bullet)
+        if len(enemy_bullets) < MAX_ENEMY_BULLETS:
+            enemy_bullets.spawn(self.world_x, self.world_y,
+                                dx / distance * ENEMY_BULLET_SPEED, dy / distance * ENEMY_BULLET_SPEED,
+                                self.angle, self.shoot_damage, BULLET_RADIUS, OWNER_ENEMY, current_time)
             self.last_shot_time = current_time
 
 class MeleeEnemy(Enemy):
-    def __init__(self, world_x, world_y, images):
+    def __init__(self, world_x, world_y, images, rng=None):
         super().__init__(world_x, world_y, images, "melee_enemy", hp=4, speed=100, 
-                         damage=5, placeholder_color=(0, 0, 255))  # 蓝色矩形
+                         damage=5, placeholder_color=(0, 0, 255), rng=rng)  # 蓝色矩形
         self.collision_radius = 20  # 近战敌人碰撞半径调整为20，与玩家相同
         self.charge_cooldown = 5000
         self.last_charge_time = 0
@@ -161,8 +173,8 @@ class MeleeEnemy(Enemy):
         self.last_contact_time = 0  # 上次接触伤害时间
         self.contact_cooldown = 1000  # 接触伤害冷却时间
 
-    def update(self, dt, player, world_width, world_height, enemy_bullets=None, current_time=None, start_hall=None, in_start_hall=False):
-        """更新近战敌人：追逐、冲刺"""
+    def update(self, dt, player, world_width, world_height, enemy_bullets=None, current_time=None, start_hall=None, in_start_hall=False, flow_field=None, collision_map=None):
+        """更新近战敌人：追逐、冲刺；有flow_field时沿流场绕开墙壁"""
         if not self.alive:
             return
         dx = player.world_x - self.world_x
@@ -171,8 +183,8 @@ class MeleeEnemy(Enemy):
         
         # 检查接触伤害 - 只有当敌人和玩家真正接触时才造成伤害
         if distance <= self.collision_radius + player.collision_radius and current_time - self.last_contact_time >= self.contact_cooldown:
-            if not player.take_damage(self.contact_damage):
-                print("Player defeated by melee enemy contact")
+            if not player.take_damage(self.contact_damage, current_time):
+                log.info("Player defeated by melee enemy contact")
             self.last_contact_time = current_time
         
         if distance > 300:
@@ -190,18 +202,23 @@ class MeleeEnemy(Enemy):
         if self.charge_timer > 0:
             self.charge_timer -= dt * 1000
             
-        if distance > 0:
+        step = flow_field.direction(self.world_x, self.world_y) if flow_field is not None else None
+        if step is not None:
+            self.direction = list(step)
+            self.last_direction = self.direction[:]
+        elif distance > 0:
             self.direction = [dx / distance, dy / distance]
             self.last_direction = self.direction[:]
             
         self.angle = math.degrees(math.atan2(-dy, dx))
-        super().update(dt, player, world_width, world_height, start_hall, in_start_hall)
+        super().update(dt, player, world_width, world_height, start_hall, in_start_hall, collision_map)
 
 class Boss(Enemy):
-    def __init__(self, world_x, world_y, images):
+    def __init__(self, world_x, world_y, images, rng=None):
         super().__init__(world_x, world_y, images, "boss", hp=10, speed=60, 
-                         damage=5, placeholder_color=(128, 0, 128))  # 紫色矩形
+                         damage=5, placeholder_color=(128, 0, 128), rng=rng)  # 紫色矩形
         self.collision_radius = 48  # Boss碰撞半径最大
+        self.shoot_damage = ENEMY_BULLET_DAMAGE
         self.shoot_cooldown = 1500
         self.last_shot_time = 0
         self.min_distance = 150
@@ -211,8 +228,8 @@ class Boss(Enemy):
         self.burst_warning_time = 0
         self.burst_warning_duration = 500
 
-    def update(self, dt, player, world_width, world_height, enemy_bullets, current_time, start_hall=None, in_start_hall=False):
-        """更新Boss：阶段性行为、爆发射击"""
+    def update(self, dt, player, world_width, world_height, enemy_bullets, current_time, start_hall=None, in_start_hall=False, flow_field=None, collision_map=None):
+        """更新Boss：阶段性行为、爆发射击；有flow_field时沿流场追击"""
         if not self.alive:
             return
         dx = player.world_x - self.world_x
@@ -223,60 +240,49 @@ class Boss(Enemy):
             self.shoot_cooldown = 1000
         if distance < self.min_distance:
             self.state = "retreat"
-            self.direction = [-dx / distance, -dy / distance] if distance > 0 else [random.uniform(-1, 1), random.uniform(-1, 1)]
+            self.direction = [-dx / distance, -dy / distance] if distance > 0 else [self.rng.uniform(-1, 1), self.rng.uniform(-1, 1)]
         else:
             self.state = "attack"
-            self.direction = [dx / distance, dy / distance] if distance > 0 else [0, 0]
+            step = flow_field.direction(self.world_x, self.world_y) if flow_field is not None else None
+            if step is not None:
+                self.direction = list(step)
+            else:
+                self.direction = [dx / distance, dy / distance] if distance > 0 else [0, 0]
         self.angle = math.degrees(math.atan2(-dy, dx))
-        if self.state == "attack" and distance > 0:
+        if self.state == "attack" and distance > 0 and self.can_see_player:
             if self.phase == 2 and current_time - self.last_burst_time >= self.burst_cooldown:
                 self.burst_warning_time = self.burst_warning_duration
                 self.last_burst_time = current_time
                 self._shoot_burst(enemy_bullets, dx, dy, distance, current_time)
             elif current_time - self.last_shot_time >= self.shoot_cooldown:
                 self._shoot_bullet(enemy_bullets, dx, dy, distance, current_time)
+        super().update(dt, player, world_width, world_height, start_hall, in_start_hall, collision_map)
+        # 预警效果在父类选择贴图之后应用，避免被覆盖
         if self.burst_warning_time > 0:
             self.burst_warning_time -= dt * 1000
             if not self.use_placeholder:
                 self.image = self._apply_warning_effect()
-        super().update(dt, player, world_width, world_height, start_hall, in_start_hall)
 
     def _shoot_bullet(self, enemy_bullets, dx, dy, distance, current_time):
         """发射单发子弹"""
-        if len(enemy_bullets) < 50:
-            bullet = {
-                "x": self.world_x,
-                "y": self.world_y,
-                "velocity": [dx / distance * ENEMY_BULLET_SPEED, dy / distance * ENEMY_BULLET_SPEED],
-                "angle": self.angle,
-                "spawn_time": current_time,
-                "visible": True
-            }
-            enemy_bullets.append(bullet)
+        if len(enemy_bullets) < MAX_ENEMY_BULLETS:
+            enemy_bullets.spawn(self.world_x, self.world_y,
+                                dx / distance * ENEMY_BULLET_SPEED, dy / distance * ENEMY_BULLET_SPEED,
+                                self.angle, self.shoot_damage, BULLET_RADIUS, OWNER_ENEMY, current_time)
             self.last_shot_time = current_time
 
     def _shoot_burst(self, enemy_bullets, dx, dy, distance, current_time):
         """发射扇形弹幕"""
-        if len(enemy_bullets) >= 50:
-            return
         angles = [-30, -15, 0, 15, 30]
+        if len(enemy_bullets) + len(angles) > MAX_ENEMY_BULLETS:
+            return
         for offset in angles:
             rad = math.radians(self.angle + offset)
-            bullet = {
-                "x": self.world_x,
-                "y": self.world_y,
-                "velocity": [math.cos(rad) * ENEMY_BULLET_SPEED, -math.sin(rad) * ENEMY_BULLET_SPEED],
-                "angle": self.angle + offset,
-                "spawn_time": current_time,
-                "visible": True
-            }
-            enemy_bullets.append(bullet)
+            enemy_bullets.spawn(self.world_x, self.world_y,
+                                math.cos(rad) * ENEMY_BULLET_SPEED, -math.sin(rad) * ENEMY_BULLET_SPEED,
+                                self.angle + offset, self.shoot_damage, BULLET_RADIUS, OWNER_ENEMY, current_time)
         self.last_shot_time = current_time
 
     def _apply_warning_effect(self):
-        """应用爆发预警效果（闪烁黄色）"""
-        yellow_tint = pygame.Surface(self.image_original.get_size(), pygame.SRCALPHA)
-        yellow_tint.fill((255, 255, 0, 128))
-        tinted_image = self.image_original.copy()
-        tinted_image.blit(yellow_tint, (0, 0), special_flags=pygame.BLEND_RGBA_MULT)
-        return pygame.transform.rotate(tinted_image, self.angle)
\ No newline at end of file
+        """应用爆发预警效果（闪烁黄色），使用缓存的染色旋转帧"""
+        return tint_cache.get_rotated(self.image_original, WARNING_TINT, self.angle)
\ No newline at end of file
@@ -0,0 +1,90 @@
+# line_of_sight.py
+from collections import OrderedDict
+
+MAX_CACHED_SIGHTLINES = 4096  # (from tile, to tile) results kept
+
+# Wall-aware line of sight over a tile grid's collision map, results cached per tile pair
+class LineOfSight:
+    def __init__(self, nav_grid=None, max_entries=MAX_CACHED_SIGHTLINES):
+        self.max_entries = max_entries
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.set_grid(nav_grid)
+
+    # Use another grid, cached results are dropped
+    def set_grid(self, nav_grid):
+        self.nav_grid = nav_grid
+        self.invalidate()
+
+    # Drop cached results, call this after the walls changed
+    def invalidate(self):
+        self.cache.clear()
+        self.grid_version = self.nav_grid.collision_map.version if self.nav_grid is not None else None
+
+    # Drop cached results when the walls changed since they were traced
+    def _check_version(self):
+        if self.nav_grid.collision_map.version != self.grid_version:
+            self.invalidate()
+
+    # Whether no wall lies between two tiles
+    def clear_between(self, start, goal):
+        if self.nav_grid is None:
+            return True
+        self._check_version()
+        key = (start, goal)
+        visible = self.cache.get(key)
+        if visible is not None:
+            self.hits += 1
+            self.cache.move_to_end(key)
+            return visible
+        self.misses += 1
+        visible = self._trace(start, goal)
+        self.cache[key] = visible
+        if len(self.cache) > self.max_entries:
+            self.cache.popitem(last=False)
+        return visible
+
+    # Whether a world position can see another one
+    def can_see(self, x, y, target_x, target_y):
+        if self.nav_grid is None:
+            return True
+        tile_size = self.nav_grid.tile_size
+        return self.clear_between((int(x // tile_size), int(y // tile_size)),
+                                  (int(target_x // tile_size), int(target_y // tile_size)))
+
+    # Line of sight from many world positions to one target, one result per position
+    def can_see_many(self, positions, target_x, target_y):
+        if self.nav_grid is None:
+            return [True] * len(positions)
+        tile_size = self.nav_grid.tile_size
+        target = (int(target_x // tile_size), int(target_y // tile_size))
+        return [self.clear_between((int(x // tile_size), int(y // tile_size)), target) for x, y in positions]
+
+    # Bresenham walk between the tiles, blocked by any wall or by leaving the grid
+    def _trace(self, start, goal):
+        bits = self.nav_grid.collision_map.bits
+        width, height = self.nav_grid.width, self.nav_grid.height
+        x0, y0 = start
+        x1, y1 = goal
+        dx = abs(x1 - x0)
+        dy = -abs(y1 - y0)
+        step_x = 1 if x0 < x1 else -1
+        step_y = 1 if y0 < y1 else -1
+        error = dx + dy
+        while True:
+            if not (0 <= x0 < width and 0 <= y0 < height) or bits[y0 * width + x0]:
+                return False
+            if x0 == x1 and y0 == y1:
+                return True
+            doubled = 2 * error
+            if doubled >= dy:
+                error += dy
+                x0 += step_x
+            if doubled <= dx:
+                error += dx
+                y0 += step_y
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
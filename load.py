@@ -1,6 +1,8 @@
 # load.py
 import pygame
 import os
+from constants import CORRIDOR_WIDTH, HIT_TINT, WARNING_TINT
+from sprite_cache import rotation_cache, tint_cache
 
 def load_images(current_path, screen_width, screen_height):
     images = {}
@@ -28,6 +30,18 @@ def load_images(current_path, screen_width, screen_height):
         images["bullet"] = bullet_original
     except Exception as e:
         print(f"Warning: Failed to load some images: {e}")
+
+    # 预先生成旋转贴图
+    for key in ("player_original", "melee_enemy", "ranged_enemy", "boss_original", "bullet"):
+        if key in images:
+            rotation_cache.prefill(images[key])
+
+    # 预先生成受击和预警效果的染色旋转贴图
+    for key in ("melee_enemy", "ranged_enemy", "boss_original"):
+        if key in images:
+            tint_cache.prefill(images[key], HIT_TINT)
+    if "boss_original" in images:
+        tint_cache.prefill(images["boss_original"], WARNING_TINT)
     
     # 加载开始大厅图片
     try:
@@ -61,7 +75,7 @@ def load_images(current_path, screen_width, screen_height):
             bg_path = os.path.join(current_path, "images", f"background_{i}.png")
             if os.path.exists(bg_path):
                 bg = pygame.image.load(bg_path).convert()
-                bg = pygame.transform.scale(bg, (screen_width * 3, screen_height * 3))
+                bg = pygame.transform.scale(bg, (screen_width, screen_height))  # 直接缩放到绘制时的大小，不再保留3倍大图
                 images[bg_key] = bg
             else:
                 print(f"Warning: Background image {bg_key} not found")
@@ -70,7 +84,7 @@ def load_images(current_path, screen_width, screen_height):
         corridor_path = os.path.join(current_path, "images", "corridor.png")
         if os.path.exists(corridor_path):
             corridor = pygame.image.load(corridor_path).convert()
-            corridor = pygame.transform.scale(corridor, (200, screen_height * 3))  # 走廊宽度固定为200
+            corridor = pygame.transform.scale(corridor, (CORRIDOR_WIDTH, CORRIDOR_WIDTH))  # 绘制大小：走廊宽度的正方形
             images["corridor"] = corridor
         else:
             print("Warning: Corridor background image not found")
@@ -0,0 +1,172 @@
+# logger.py
+import atexit
+import os
+import threading
+import time
+from collections import deque
+from queue import SimpleQueue, Empty
+
+# levels
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+LEVEL_NAMES = {DEBUG: "DEBUG", INFO: "INFO", WARNING: "WARNING", ERROR: "ERROR"}
+
+DEFAULT_LEVEL = INFO  # level of loggers without their own setting
+CONSOLE_LEVEL = WARNING  # records at or above this level are also printed
+# next to the game files rather than in the working directory, GAME_LOG_FILE overrides it ("" turns the file off)
+LOG_FILE = os.environ.get("GAME_LOG_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "game.log"))
+RING_BUFFER_SIZE = 2048  # recent records kept in memory for crash dumps
+FLUSH_INTERVAL = 0.5  # seconds between background writes
+
+SCALAR_TYPES = (int, float, str, bytes, bool, type(None))  # arguments that cannot change after the call
+
+# Make a record that keeps its values: scalar arguments are formatted later by the writer,
+# anything else (lists, positions, entities) is formatted now because it may change before the flush
+def make_record(name, level, message, args):
+    if args and not all(type(arg) in SCALAR_TYPES for arg in args):
+        try:
+            message = message % args
+        except (TypeError, ValueError):
+            message = f"{message} {args}"
+        args = ()
+    return (time.time(), name, level, message, args)
+
+# A record is (time, logger name, level, message, args), message % args is only done when writing
+def format_record(record):
+    timestamp, name, level, message, args = record
+    if args:
+        try:
+            message = message % args
+        except (TypeError, ValueError):
+            message = f"{message} {args}"
+    clock = time.strftime("%H:%M:%S", time.localtime(timestamp))
+    return f"{clock}.{int(timestamp * 1000) % 1000:03d} {LEVEL_NAMES.get(level, level)} [{name}] {message}"
+
+# Collects records from the game thread and writes them from a background thread
+class LogSink:
+    def __init__(self, path=LOG_FILE, ring_size=RING_BUFFER_SIZE, console_level=CONSOLE_LEVEL, flush_interval=FLUSH_INTERVAL):
+        self.path = path
+        self.console_level = console_level
+        self.flush_interval = flush_interval
+        self.recent = deque(maxlen=ring_size)  # deque.append is atomic, the game thread never takes a lock
+        self.pending = SimpleQueue()  # records not written yet
+        self.thread = None
+        self.stopping = threading.Event()
+        self.file = None
+
+    def emit(self, record):
+        self.recent.append(record)
+        self.pending.put(record)
+        if self.thread is None:
+            self._start()
+
+    # A forked child has no writer thread and must not share the parent's file handle
+    def _after_fork(self):
+        self.thread = None
+        self.stopping = threading.Event()
+        self.pending = SimpleQueue()
+        self.file = None
+
+    def _start(self):
+        self.thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def _run(self):
+        while not self.stopping.wait(self.flush_interval):
+            self.flush()
+        self.flush()
+
+    # Write every pending record in one batch
+    def flush(self):
+        lines = []
+        console_lines = []
+        while True:
+            try:
+                record = self.pending.get_nowait()
+            except Empty:
+                break
+            line = format_record(record)
+            lines.append(line)
+            if record[2] >= self.console_level:
+                console_lines.append(line)
+        if not lines:
+            return
+        if self.path:
+            try:
+                if self.file is None:
+                    self.file = open(self.path, "a", encoding="utf-8")
+                self.file.write("\n".join(lines) + "\n")
+                self.file.flush()
+            except OSError as e:
+                print(f"Warning: Failed to write log file: {e}")
+                self.path = None
+        if console_lines:
+            print("\n".join(console_lines))
+
+    # Stop the writer thread after a last flush
+    def close(self):
+        if self.thread is not None and self.thread.is_alive():
+            self.stopping.set()
+            self.thread.join(timeout=1.0)
+        else:
+            self.flush()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    # Formatted recent records, oldest first
+    def recent_lines(self):
+        return [format_record(record) for record in list(self.recent)]
+
+# Named logger, the level check happens before anything is formatted
+class Logger:
+    def __init__(self, name, sink, level=None):
+        self.name = name
+        self.sink = sink
+        self.level = DEFAULT_LEVEL if level is None else level
+
+    def is_enabled(self, level):
+        return level >= self.level
+
+    def log(self, level, message, *args):
+        if level >= self.level:
+            self.sink.emit(make_record(self.name, level, message, args))
+
+    def debug(self, message, *args):
+        if DEBUG >= self.level:
+            self.sink.emit(make_record(self.name, DEBUG, message, args))
+
+    def info(self, message, *args):
+        if INFO >= self.level:
+            self.sink.emit(make_record(self.name, INFO, message, args))
+
+    def warning(self, message, *args):
+        if WARNING >= self.level:
+            self.sink.emit(make_record(self.name, WARNING, message, args))
+
+    def error(self, message, *args):
+        if ERROR >= self.level:
+            self.sink.emit(make_record(self.name, ERROR, message, args))
+
+sink = LogSink()
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=sink._after_fork)
+_loggers = {}
+
+# Logger for a module, created on first use
+def get_logger(name):
+    logger = _loggers.get(name)
+    if logger is None:
+        logger = _loggers[name] = Logger(name, sink)
+    return logger
+
+# Set the level of one module's logger, e.g. set_level("world", DEBUG)
+def set_level(name, level):
+    get_logger(name).level = level
+
+# Recent records as text, used for crash reports
+def recent_lines():
+    return sink.recent_lines()
@@ -5,19 +5,29 @@ import traceback
 import sys
 import random
 from initial import initialize_game
-from bullet import shoot_bullet, update_bullets
-from constants import BULLETS, ENEMIES, ENEMY_BULLETS, SHOOT_COOLDOWN, F_KEY_COOLDOWN, ENERGY_RECOVERY_RATE, LAST_SHOT_TIME, LAST_F_KEY_TIME, GAME_OVER_DELAY, PLAYER_BULLET_DAMAGE
-from render import draw_start_hall, draw_main_level, draw_game_over, message_system
+from bullet import shoot_bullet
+from constants import BULLETS, ENEMIES, ENEMY_BULLETS, SHOOT_COOLDOWN, F_KEY_COOLDOWN, LAST_SHOT_TIME, LAST_F_KEY_TIME, GAME_OVER_DELAY, PLAYER_BULLET_DAMAGE, DIRTY_RECT_MODE, SHOW_STATS_OVERLAY, SIM_TICK_RATE, MAX_TICKS_PER_FRAME
+from render import draw_start_hall, draw_main_level, draw_game_over, draw_stats_overlay, message_system
 from menu import BatteryMenu, PropertyTreeMenu
 from enemy import RangedEnemy, MeleeEnemy, Boss
+from text_cache import text_cache
+from display import DisplayUpdater
+from camera import Camera
+from simulation import Simulation, SimInput
+from region_index import RegionIndex
+import logger
+
+log = logger.get_logger("main")
 
 # 设置异常处理
 def exception_handler(exctype, value, tb):
     error_msg = ''.join(traceback.format_exception(exctype, value, tb))
+    recent = "\n".join(logger.recent_lines())  # 崩溃前的最近日志
     print("发生错误:")
     print(error_msg)
-    with open("error_log.txt", "a") as f:
-        f.write(f"\n\n{error_msg}")
+    with open("error_log.txt", "a", encoding="utf-8") as f:
+        f.write(f"\n\n{error_msg}\nRecent log:\n{recent}\n")
+    logger.sink.close()
     pygame.quit()
     sys.exit(1)
 
@@ -28,9 +38,9 @@ def show_input_reminder(win, font, screen_width, screen_height):
     title_font = pygame.font.Font(None, 72)
     subtitle_font = pygame.font.Font(None, 36)
     
-    title = title_font.render("Z2H", True, (255, 255, 255))
-    subtitle = subtitle_font.render("Please switch to English input method for WASD movement", True, (200, 200, 200))
-    press_key = subtitle_font.render("Press any key to continue...", True, (150, 150, 150))
+    title = text_cache.render(title_font, "Z2H", True, (255, 255, 255))
+    subtitle = text_cache.render(subtitle_font, "Please switch to English input method for WASD movement", True, (200, 200, 200))
+    press_key = text_cache.render(subtitle_font, "Press any key to continue...", True, (150, 150, 150))
     
     title_rect = title.get_rect(center=(screen_width // 2, screen_height // 3))
     subtitle_rect = subtitle.get_rect(center=(screen_width // 2, screen_height // 2))
@@ -57,7 +67,7 @@ try:
     constants.HALL_WIDTH = screen_width
     constants.HALL_HEIGHT = screen_height
 except Exception as e:
-    print(f"Initialization failed: {e}")
+    log.error("Initialization failed: %s", e)
     pygame.quit()
     exit(1)
 
@@ -70,8 +80,14 @@ WORLD_WIDTH = screen_width * 3
 WORLD_HEIGHT = screen_height * 3
 battery_menu = BatteryMenu(screen_width, screen_height)
 property_tree_menu = PropertyTreeMenu(screen_width, screen_height)
+corridor_font = pygame.font.Font(None, 36)
+display_updater = DisplayUpdater(DIRTY_RECT_MODE)
+camera = Camera(screen_width, screen_height)
+show_stats = SHOW_STATS_OVERLAY
 clock = pygame.time.Clock()
 last_update_time = pygame.time.get_ticks()
+SIM_DT = 1.0 / SIM_TICK_RATE  # 固定模拟步长（秒）
+accumulator = 0.0  # 尚未模拟的时间（秒）
 game_over = False
 game_over_time = 0
 
@@ -126,31 +142,28 @@ class World:
             3: {"background": "background_3", "is_boss": False, "cleared": False},
             4: {"background": "background_4", "is_boss": True, "cleared": False}
         }
+        self.build_region_index()
     
-    def get_current_area(self, x, y):
-        print(f"Checking position ({x}, {y})")  # 调试信息
-        
-        # 检查是否在走廊中
+    # 预先建立区域索引，查询时不再逐个扫描
+    def build_region_index(self):
+        self.region_index = RegionIndex()
+        # 走廊优先于关卡
         for corridor_id, corridor in self.corridors.items():
-            corridor_x = corridor["start"][0]
-            corridor_y = corridor["start"][1]
-            if (abs(x - corridor_x) <= corridor["width"] and
-                abs(y - corridor_y) <= corridor["width"] // 2):
-                print(f"Found in corridor {corridor_id}")  # 调试信息
-                return corridor_id
-        
-        # 检查是否在关卡中
-        for level_id, center in self.level_centers.items():
-            level_x = center[0]
-            level_y = center[1]
-            # 使用屏幕尺寸作为关卡范围
-            if (abs(x - level_x) <= self.screen_width // 2 and
-                abs(y - level_y) <= self.screen_height // 2):
-                print(f"Found in level {level_id}")  # 调试信息
-                return level_id
-        
-        print("Not found in any area")  # 调试信息
-        return None
+            corridor_x, corridor_y = corridor["start"]
+            half_height = corridor["width"] // 2
+            self.region_index.add(corridor_id, corridor_x - corridor["width"], corridor_y - half_height,
+                                  corridor_x + corridor["width"], corridor_y + half_height)
+        # 使用屏幕尺寸作为关卡范围
+        for level_id, (level_x, level_y) in self.level_centers.items():
+            self.region_index.add(level_id, level_x - self.screen_width // 2, level_y - self.screen_height // 2,
+                                  level_x + self.screen_width // 2, level_y + self.screen_height // 2)
+
+    def get_current_area(self, x, y):
+        return self.region_index.lookup(x, y)
+
+    # 哪些点在走廊中（批量，用于子弹）
+    def corridor_mask(self, x, y):
+        return self.region_index.contains_many(x, y, self.corridors)
 
     def get_next_level(self, current_level):
         if current_level < 4:
@@ -167,28 +180,31 @@ class World:
 
 # 创建世界实例
 world = World(screen_width, screen_height)
+# 游戏逻辑与显示分离，模拟核心共享玩家、大厅、敌人和子弹
+simulation = Simulation(screen_width, screen_height, images=images, player=player, start_hall=start_hall, world=world,
+                        enemies=ENEMIES, bullets=BULLETS, enemy_bullets=ENEMY_BULLETS)
 
 # 初始化敌人（在主关卡生成）
 def spawn_enemies():
     try:
-        print("开始生成敌人...")
+        log.debug("开始生成敌人...")
         ENEMIES.clear()
         ENEMY_BULLETS.clear()  # 清空敌人子弹
         # 在主关卡中生成敌人
-        print("生成远程敌人1...")
-        ENEMIES.append(RangedEnemy(1000, 1000, images))
-        print("生成远程敌人2...")
-        ENEMIES.append(RangedEnemy(1200, 1200, images))
-        print("生成近战敌人1...")
-        ENEMIES.append(MeleeEnemy(1400, 1400, images))
-        print("生成近战敌人2...")
-        ENEMIES.append(MeleeEnemy(1600, 1600, images))
-        print("生成Boss...")
-        ENEMIES.append(Boss(2000, 2000, images))
-        print("敌人生成完成")
+        log.debug("生成远程敌人1...")
+        ENEMIES.append(RangedEnemy(1000, 1000, images, simulation.rng))
+        log.debug("生成远程敌人2...")
+        ENEMIES.append(RangedEnemy(1200, 1200, images, simulation.rng))
+        log.debug("生成近战敌人1...")
+        ENEMIES.append(MeleeEnemy(1400, 1400, images, simulation.rng))
+        log.debug("生成近战敌人2...")
+        ENEMIES.append(MeleeEnemy(1600, 1600, images, simulation.rng))
+        log.debug("生成Boss...")
+        ENEMIES.append(Boss(2000, 2000, images, simulation.rng))
+        log.info("敌人生成完成")
         return True
     except Exception as e:
-        print(f"敌人生成失败: {e}")
+        log.error("敌人生成失败: %s", e)
         traceback.print_exc()
         return False
 
@@ -203,6 +219,7 @@ def reset_game():
     player.backpack_used = 10  # 重置背包已用空间
     player.world_x = start_hall.width * start_hall.tile_size // 2  # 大厅中心
     player.world_y = start_hall.height * start_hall.tile_size // 2
+    player.save_previous_position()
     player.direction = [0.0, 0.0]  # 停止移动
     player.angle = 0.0  # 重置朝向
     player.image = player.image_original  # 重置图像旋转
@@ -216,11 +233,20 @@ def reset_game():
     battery_menu.active = False
     game_over = False
     game_over_time = 0
+    simulation.game_over = False
     current_level = 1
     level_cleared = {1: False, 2: False, 3: False, 4: False}
     corridor_entered = False
     corridor_exit = False
-    print("Reset game state.")
+    log.info("Reset game state.")
+
+# 固定步长的模拟更新，返回玩家是否死亡
+def simulate_tick(keys, tick_time):
+    simulation.in_start_hall = in_start_hall
+    if simulation.step(SimInput(keys=keys, mouse_pos=pygame.mouse.get_pos(), player_locked=battery_menu.active), tick_time):
+        log.info("Player HP: %s", player.hp)
+        return True
+    return False
 
 # main game loop
 running = True
@@ -236,6 +262,8 @@ while running:
     for event in pygame.event.get():
         if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
             running = False
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+            show_stats = not show_stats
         if not game_over and battery_menu.handle_event(event, player, start_hall):
             continue
         if not game_over and property_tree_menu.handle_event(event, player):
@@ -245,10 +273,10 @@ while running:
         if not game_over and event.type == pygame.KEYDOWN and event.key == pygame.K_e:
             if start_hall.check_battery_interaction(player, pygame.key.get_pressed()):
                 battery_menu.active = True
-                print(f"Battery menu activated: {battery_menu.active}")
+                log.debug("Battery menu activated: %s", battery_menu.active)
             elif start_hall.check_property_tree_interaction(player, pygame.key.get_pressed()):
                 property_tree_menu.active = True
-                print(f"Property tree menu activated: {property_tree_menu.active}")
+                log.debug("Property tree menu activated: %s", property_tree_menu.active)
 
         # handle key press
         if not game_over and not battery_menu.active:
@@ -277,7 +305,7 @@ while running:
         win.fill((0, 0, 0))
         
         # 绘制游戏结束画面
-        game_over_text = font.render("GAME OVER", True, red)
+        game_over_text = text_cache.render(font, "GAME OVER", True, red)
         
         # 计算文本位置
         game_over_rect = game_over_text.get_rect(center=(screen_width // 2, screen_height // 2))
@@ -286,7 +314,8 @@ while running:
         win.blit(game_over_text, game_over_rect)
         
         # 更新显示
-        pygame.display.flip()
+        display_updater.request_full_update()
+        display_updater.present([])
         
         # 检查是否重启游戏
         if current_time - game_over_time >= GAME_OVER_DELAY:
@@ -295,43 +324,27 @@ while running:
         continue
 
     if not game_over:
-        player.recover_energy(ENERGY_RECOVERY_RATE * dt)
+        # 固定步长模拟：按真实经过的时间累积，每次消耗一个SIM_DT
+        accumulator += min(dt, SIM_DT * MAX_TICKS_PER_FRAME)
+        ticks = 0
+        while accumulator >= SIM_DT and ticks < MAX_TICKS_PER_FRAME:
+            accumulator -= SIM_DT
+            ticks += 1
+            tick_time = int(current_time - accumulator * 1000)
+            if simulate_tick(keys, tick_time):
+                game_over = True
+                game_over_time = tick_time
+                break
+        if game_over:
+            accumulator = 0.0
+            continue
 
-        if not battery_menu.active:
-            # update player
-            player.update(keys, current_time, pygame.mouse.get_pos())
+        # 渲染插值系数：当前时间在上一次和下一次模拟之间的位置
+        alpha = accumulator / SIM_DT
 
         # calculate camera offset
-        camera_offset = (screen_width // 2 - player.world_x, screen_height // 2 - player.world_y)
-
-        # 更新敌人
-        for enemy in ENEMIES[:]:
-            enemy.update(dt, player, WORLD_WIDTH, WORLD_HEIGHT, ENEMY_BULLETS, current_time, start_hall if in_start_hall else None, in_start_hall)
-            if not enemy.alive:
-                ENEMIES.remove(enemy)
-
-        # update bullets
-        update_bullets(BULLETS, WORLD_WIDTH, WORLD_HEIGHT, current_time, player, images.get("player_original"), images.get("bullet_original"), start_hall if in_start_hall else None, in_start_hall, ENEMIES)
-        
-        # 更新敌人子弹，如果玩家死亡则结束游戏
-        bullet_result = update_bullets(ENEMY_BULLETS, WORLD_WIDTH, WORLD_HEIGHT, current_time, player, images.get("player_original"), images.get("bullet_original"), start_hall if in_start_hall else None, in_start_hall)
-        if bullet_result:
-            print(f"Player HP after bullet damage: {player.hp}")
-            game_over = True
-            game_over_time = current_time
-            print("Player defeated by enemy bullet")
-            continue
-
-        # 检查近战敌人的攻击
-        for enemy in ENEMIES:
-            if isinstance(enemy, MeleeEnemy) and enemy.alive and current_time - enemy.last_contact_time >= enemy.contact_cooldown:
-                if enemy.rect.colliderect(player.rect):
-                    if not player.take_damage(enemy.contact_damage):
-                        print(f"Player HP after contact damage: {player.hp}")
-                        game_over = True
-                        game_over_time = current_time
-                        print("Player defeated by melee enemy contact")
-                    enemy.last_contact_time = current_time
+        camera_offset = camera.follow(*player.render_position(alpha))
+        camera.reset_stats()
 
         # draw start hall or main level
         if in_start_hall:
@@ -344,6 +357,7 @@ while running:
                     # 将玩家传送到主关卡中心
                     player.world_x = WORLD_WIDTH // 2
                     player.world_y = WORLD_HEIGHT // 2
+                    player.save_previous_position()
                     # 恢复玩家状态
                     player.energy = player.max_energy
                     player.hp = player.max_hp
@@ -355,60 +369,63 @@ while running:
                                          random.randint(100, WORLD_HEIGHT - 100),
                                          images["melee_enemy"])
                         enemies.append(enemy)
-                    print("Entered level 1 from start hall")
+                    log.info("Entered level 1 from start hall")
             if start_hall.check_gate_interaction(player, keys):
                 try:
                     # 先清空所有子弹
                     BULLETS.clear()
                     ENEMY_BULLETS.clear()
-                    print("子弹已清空")
+                    log.debug("子弹已清空")
                     
                     # 设置玩家位置到主关卡
                     player.world_x = WORLD_WIDTH // 2
                     player.world_y = WORLD_HEIGHT // 2
-                    print(f"玩家位置已设置: ({player.world_x}, {player.world_y})")
+                    player.save_previous_position()
+                    log.debug("玩家位置已设置: (%s, %s)", player.world_x, player.world_y)
                     
                     # 生成敌人
-                    print("开始生成敌人...")
+                    log.debug("开始生成敌人...")
                     if not spawn_enemies():
                         raise Exception("敌人生成失败")
-                    print("敌人生成完成")
+                    log.info("敌人生成完成")
                     
                     # 最后切换关卡状态
                     in_start_hall = False
                     message_system.add_message("Energy fully restored!")
-                    print("成功进入主关卡")
+                    log.info("成功进入主关卡")
                     
                     # 强制更新显示
                     pygame.display.flip()
                 except Exception as e:
-                    print(f"进入主关卡失败: {e}")
+                    log.error("进入主关卡失败: %s", e)
                     traceback.print_exc()
                     message_system.add_message("Failed to enter main level!")
                     continue
             
             # 绘制开始大厅
             try:
-                draw_start_hall(win, red, font, screen_width, screen_height, images, start_hall, player, BULLETS, camera_offset, ENEMIES, ENEMY_BULLETS)
+                dirty_rects = draw_start_hall(win, red, font, screen_width, screen_height, images, start_hall, player, BULLETS, camera_offset, ENEMIES, ENEMY_BULLETS, camera, alpha)
             except Exception as e:
-                print(f"绘制开始大厅失败: {e}")
+                log.error("绘制开始大厅失败: %s", e)
                 traceback.print_exc()
                 continue
         else:
             # 绘制主关卡
             try:
-                draw_main_level(win, images, player, BULLETS, camera_offset, font, screen_width, screen_height, ENEMIES, ENEMY_BULLETS, world)
+                dirty_rects = draw_main_level(win, images, player, BULLETS, camera_offset, font, screen_width, screen_height, ENEMIES, ENEMY_BULLETS, world, camera, alpha)
             except Exception as e:
-                print(f"绘制主关卡失败: {e}")
+                log.error("绘制主关卡失败: %s", e)
                 traceback.print_exc()
                 continue
 
         # draw battery menu and property tree menu
         try:
-            battery_menu.draw(win, start_hall)
-            property_tree_menu.draw(win)
+            dirty_rects += battery_menu.draw(win, start_hall)
+            dirty_rects += property_tree_menu.draw(win)
+            if show_stats:
+                dirty_rects += draw_stats_overlay(win, font, camera, clock)
         except Exception as e:
-            print(f"绘制菜单失败: {e}")
+            log.error("绘制菜单失败: %s", e)
             traceback.print_exc()
             continue
 
@@ -421,13 +438,12 @@ while running:
                 player.x = screen_width - 200
             
             # 在走廊中显示提示信息
-            font = pygame.font.Font(None, 36)
             if not level_cleared[current_level]:
-                text = font.render("Clear all enemies to proceed!", True, (255, 255, 255))
+                text = text_cache.render(corridor_font, "Clear all enemies to proceed!", True, (255, 255, 255))
             else:
-                text = font.render("Press SPACE to enter next level", True, (255, 255, 255))
+                text = text_cache.render(corridor_font, "Press SPACE to enter next level", True, (255, 255, 255))
             text_x = screen_width // 2 - text.get_width() // 2
-            win.blit(text, (text_x, 50))
+            dirty_rects.append(win.blit(text, (text_x, 50)))
             
             # 检查是否按下空格键进入下一关
             if level_cleared[current_level] and keys[pygame.K_SPACE]:
@@ -474,7 +490,8 @@ while running:
                             corridor = world.corridors[corridor_id]
                             player.world_x = corridor["start"][0] + 100
                             player.world_y = corridor["start"][1]
-                            print(f"Entered corridor {corridor_id}")
+                            player.save_previous_position()
+                            log.info("Entered corridor %s", corridor_id)
             
             elif isinstance(current_area, str) and "corridor" in current_area:  # 在走廊中
                 corridor = world.corridors[current_area]
@@ -492,8 +509,9 @@ while running:
                             gate_y = world.level_centers[from_level][1]
                             player.world_x = gate_x
                             player.world_y = gate_y
+                            player.save_previous_position()
                             current_level = from_level
-                            print(f"Returned to level {from_level}")
+                            log.info("Returned to level %s", from_level)
                         # 检查是否在右门附近且关卡已清空
                         elif (abs(player.world_x - corridor["end"][0]) < 100 and 
                               abs(player.world_y - corridor["end"][1]) < 100 and 
@@ -501,14 +519,18 @@ while running:
                             # 进入右侧关卡
                             player.world_x = world.level_centers[to_level][0] - world.world_width//4
                             player.world_y = world.level_centers[to_level][1]
+                            player.save_previous_position()
                             current_level = to_level
-                            print(f"Entered level {to_level}")
+                            log.info("Entered level %s", to_level)
 
         # 更新显示
-        pygame.display.flip()
+        display_updater.present(dirty_rects, camera_offset)
 
     # limit frame rate to 120 FPS
     clock.tick(120)
 
+# report text cache usage
+log.info("Text cache: %s", text_cache.stats())
+
 # quit pygame
 pygame.quit()
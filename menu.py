@@ -2,6 +2,7 @@
 import pygame
 import starthall
 from render import message_system
+from text_cache import text_cache
 
 # BatteryMenu class
 class BatteryMenu:
@@ -85,28 +86,28 @@ class BatteryMenu:
                 return True
         return False
 
-    # Draw the menu
+    # Draw the menu, returns the changed rectangles for dirty-rect updates
     def draw(self, win, start_hall):
         # Check if the menu is active
         if not self.active:
-            return
+            return []
         # Draw the menu
         pygame.draw.rect(win, (50, 50, 50, 200), self.menu_rect)
 
         # 显示仓库内的电池数量
-        storage_text = self.menu_font.render(f"Storage: {start_hall.battery_storage}/{start_hall.battery_limit}", True, (255, 255, 255))
+        storage_text = text_cache.render(self.menu_font, f"Storage: {start_hall.battery_storage}/{start_hall.battery_limit}", True, (255, 255, 255))
         win.blit(storage_text, storage_text.get_rect(center=(self.menu_rect.centerx, self.menu_rect.y + 20)))
 
         # Add exit hint
-        exit_hint = self.hint_font.render("Press E to exit", True, (200, 200, 200))
+        exit_hint = text_cache.render(self.hint_font, "Press E to exit", True, (200, 200, 200))
         win.blit(exit_hint, exit_hint.get_rect(center=(self.menu_rect.centerx, self.menu_rect.bottom - 30)))
 
         # Draw the buttons and slider
         if self.menu_state is None:
             pygame.draw.rect(win, (0, 200, 0), self.deposit_button)
             pygame.draw.rect(win, (200, 0, 0), self.withdraw_button)
-            deposit_text = self.menu_font.render("Deposit", True, (255, 255, 255))
-            withdraw_text = self.menu_font.render("Withdraw", True, (255, 255, 255))
+            deposit_text = text_cache.render(self.menu_font, "Deposit", True, (255, 255, 255))
+            withdraw_text = text_cache.render(self.menu_font, "Withdraw", True, (255, 255, 255))
             win.blit(deposit_text, deposit_text.get_rect(center=self.deposit_button.center))
             win.blit(withdraw_text, withdraw_text.get_rect(center=self.withdraw_button.center))
         # Draw the slider and amount
@@ -116,8 +117,9 @@ class BatteryMenu:
             knob_rect = pygame.Rect(knob_x - self.knob_size // 2, self.slider_rect.y - 5, self.knob_size, self.knob_size + 10)
             pygame.draw.rect(win, (255, 255, 0), knob_rect)
             amount = int((self.slider_pos / 200) * self.max_amount)
-            amount_text = self.menu_font.render(f"Amount: {amount}", True, (255, 255, 255))
+            amount_text = text_cache.render(self.menu_font, f"Amount: {amount}", True, (255, 255, 255))
             win.blit(amount_text, amount_text.get_rect(center=(self.menu_rect.centerx, self.menu_rect.centery + 40)))
+        return [self.menu_rect]
 
 # PropertyTreeMenu class
 class PropertyTreeMenu:
@@ -171,16 +173,16 @@ class PropertyTreeMenu:
                             return True
         return False
 
-    # Draw the menu
+    # Draw the menu, returns the changed rectangles for dirty-rect updates
     def draw(self, win):
         if not self.active:
-            return
+            return []
         
         # Draw the menu background
-        pygame.draw.rect(win, (50, 50, 50, 200), self.menu_rect)
+        dirty_rects = [pygame.draw.rect(win, (50, 50, 50, 200), self.menu_rect)]
 
         # Draw the title
-        title_text = self.menu_font.render("Skill Selection", True, (255, 255, 255))
+        title_text = text_cache.render(self.menu_font, "Skill Selection", True, (255, 255, 255))
         title_rect = title_text.get_rect(center=(self.menu_rect.centerx, self.menu_rect.y + 30))
         win.blit(title_text, title_rect)
 
@@ -195,14 +197,15 @@ class PropertyTreeMenu:
             pygame.draw.rect(win, button_color, button)
             
             # 显示技能名称
-            skill_text = self.menu_font.render(skill_name.replace("_", " ").title(), True, (255, 255, 255))
+            skill_text = text_cache.render(self.menu_font, skill_name.replace("_", " ").title(), True, (255, 255, 255))
             win.blit(skill_text, skill_text.get_rect(center=button.center))
             
             # 如果技能锁定，显示"Locked"
             if self.skill_locked[skill_name]:
-                locked_text = self.hint_font.render("Locked", True, (255, 0, 0))
-                win.blit(locked_text, (button.right + 10, button.centery - 10))
+                locked_text = text_cache.render(self.hint_font, "Locked", True, (255, 0, 0))
+                dirty_rects.append(win.blit(locked_text, (button.right + 10, button.centery - 10)))
 
         # Add exit hint
-        exit_hint = self.hint_font.render("Press E to exit", True, (200, 200, 200))
-        win.blit(exit_hint, exit_hint.get_rect(center=(self.menu_rect.centerx, self.menu_rect.bottom - 30)))
\ No newline at end of file
+        exit_hint = text_cache.render(self.hint_font, "Press E to exit", True, (200, 200, 200))
+        win.blit(exit_hint, exit_hint.get_rect(center=(self.menu_rect.centerx, self.menu_rect.bottom - 30)))
+        return dirty_rects
\ No newline at end of file
@@ -0,0 +1,94 @@
+# occupancy.py
+import numpy as np
+
+PLACEMENT_PROBES = 16  # random placement tries before enumerating every free position
+
+# Occupied tiles with a summed-area table on top: the number of occupied tiles
+# in any rectangle is four lookups, and every free position of a size is one vectorized pass
+class OccupancyTable:
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.occupied = np.zeros((height, width), dtype=np.uint8)
+        self._table = None  # (height + 1, width + 1) prefix sums, updated in place or rebuilt lazily
+
+    # Mark a rectangle as occupied
+    def mark(self, x, y, w, h):
+        left, top = max(0, x), max(0, y)
+        right, bottom = min(x + w, self.width), min(y + h, self.height)
+        if right <= left or bottom <= top:
+            return
+        region = self.occupied[top:bottom, left:right]
+        if self._table is not None and not region.any():
+            # 新占满的矩形对前缀和的贡献是行、列两个截断斜坡的外积，只影响右下方
+            rows = np.minimum(np.arange(1, self.height - top + 1), bottom - top)
+            cols = np.minimum(np.arange(1, self.width - left + 1), right - left)
+            self._table[top + 1:, left + 1:] += np.outer(rows, cols).astype(np.int32)
+        else:
+            self._table = None
+        region[:] = 1
+
+    def table(self):
+        if self._table is None:
+            table = np.zeros((self.height + 1, self.width + 1), dtype=np.int32)
+            np.cumsum(np.cumsum(self.occupied, axis=0, dtype=np.int32), axis=1, out=table[1:, 1:])
+            self._table = table
+        return self._table
+
+    # Occupied tiles inside a rectangle, parts outside the table count as free
+    def count(self, x, y, w, h):
+        left = min(max(x, 0), self.width)
+        top = min(max(y, 0), self.height)
+        right = min(max(x + w, 0), self.width)
+        bottom = min(max(y + h, 0), self.height)
+        table = self.table()
+        return int(table[bottom, right] - table[top, right] - table[bottom, left] + table[top, left])
+
+    # Whether a rectangle and a margin of padding tiles around it are free
+    def is_free(self, x, y, w, h, padding=0):
+        return self.count(x - padding, y - padding, w + padding * 2, h + padding * 2) == 0
+
+    # Every top-left (x, y) in [min_x, max_x] x [min_y, max_y] where a w x h rectangle with padding is free,
+    # returned as two arrays
+    def free_positions(self, w, h, padding=0, min_x=0, min_y=0, max_x=None, max_y=None):
+        min_x = max(min_x, 0)
+        min_y = max(min_y, 0)
+        max_x = self.width - w if max_x is None else min(max_x, self.width - w)
+        max_y = self.height - h if max_y is None else min(max_y, self.height - h)
+        if max_x < min_x or max_y < min_y:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+        table = self.table()
+        if padding:
+            # 边缘复制填充后越界的下标等于截断到边界，四个角都能直接切片
+            table = np.pad(table, padding, mode="edge")
+        cols = max_x - min_x + 1
+        rows = max_y - min_y + 1
+        left = min_x
+        right = min_x + w + padding * 2
+        top = min_y
+        bottom = min_y + h + padding * 2
+        counts = (table[bottom:bottom + rows, right:right + cols] - table[top:top + rows, right:right + cols]
+                  - table[bottom:bottom + rows, left:left + cols] + table[top:top + rows, left:left + cols])
+        free_y, free_x = np.nonzero(counts == 0)
+        return free_x + min_x, free_y + min_y
+
+    # Mark and return a random free top-left in [min_x, max_x] x [min_y, max_y] for a w x h rectangle, None if there is none.
+    # A few random probes first, each one is four table lookups; a crowded map falls back to listing every free slot
+    def place(self, rng, w, h, padding=0, min_x=0, min_y=0, max_x=None, max_y=None, probes=PLACEMENT_PROBES):
+        max_x = self.width - w if max_x is None else max_x
+        max_y = self.height - h if max_y is None else max_y
+        if max_x < min_x or max_y < min_y:
+            return None
+        for _ in range(probes):
+            x = rng.randint(min_x, max_x)
+            y = rng.randint(min_y, max_y)
+            if self.is_free(x, y, w, h, padding):
+                break
+        else:
+            xs, ys = self.free_positions(w, h, padding, min_x, min_y, max_x, max_y)
+            if len(xs) == 0:
+                return None
+            index = rng.randrange(len(xs))
+            x, y = int(xs[index]), int(ys[index])
+        self.mark(x, y, w, h)
+        return x, y
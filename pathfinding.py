@@ -0,0 +1,322 @@
+# pathfinding.py
+import heapq
+from collections import deque, OrderedDict
+
+FLOW_MAX_DISTANCE = 64  # search radius in tiles, enemies farther away steer straight at the target
+
+MAX_CACHED_PATHS = 256  # room graph path cache size
+
+# steering directions, diagonals are only taken when both side tiles are open
+NEIGHBORS = ((1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (1, -1), (-1, 1), (-1, -1))
+
+# Distance field toward one target tile, shared by every chasing enemy
+class FlowField:
+    def __init__(self, nav_grid=None, max_distance=FLOW_MAX_DISTANCE):
+        self.max_distance = max_distance
+        self.rebuilds = 0  # number of searches, for profiling
+        self.set_grid(nav_grid)
+
+    # Use a tile grid (World or StartHall: width, height, tile_size and a collision_map)
+    def set_grid(self, nav_grid):
+        self.nav_grid = nav_grid
+        self.target_tile = None
+        self.distance = None
+        self.passable = None
+        self.grid_version = None  # collision_map.version the passable list was read at
+        if nav_grid is not None:
+            self.width = nav_grid.width
+            self.height = nav_grid.height
+            self.tile_size = nav_grid.tile_size
+            self.refresh()
+
+    # Re-read the walls after the grid changed
+    def refresh(self):
+        collision_map = self.nav_grid.collision_map
+        self.passable = [not solid for solid in collision_map.bits]
+        self.grid_version = collision_map.version
+        self.target_tile = None
+        self.distance = None
+
+    # Move the target to a world position, the field is only rebuilt when the target changes tile
+    def update(self, target_x, target_y):
+        if self.nav_grid is None:
+            return False
+        if self.nav_grid.collision_map.version != self.grid_version:
+            self.refresh()
+        tile = (int(target_x // self.tile_size), int(target_y // self.tile_size))
+        if tile == self.target_tile:
+            return False
+        self.target_tile = tile
+        self._build(*tile)
+        return True
+
+    # Breadth-first search from the target tile, -1 marks unreached tiles
+    def _build(self, target_x, target_y):
+        self.rebuilds += 1
+        width, height = self.width, self.height
+        passable = self.passable
+        if not (0 <= target_x < width and 0 <= target_y < height) or not passable[target_y * width + target_x]:
+            self.distance = None
+            return
+        distance = [-1] * (width * height)
+        start = target_y * width + target_x
+        distance[start] = 0
+        queue = deque((start,))
+        max_distance = self.max_distance
+        last_row = (height - 1) * width
+        while queue:
+            i = queue.popleft()
+            d = distance[i] + 1
+            if d > max_distance:
+                continue
+            x = i % width
+            if x > 0 and distance[i - 1] < 0 and passable[i - 1]:
+                distance[i - 1] = d
+                queue.append(i - 1)
+            if x < width - 1 and distance[i + 1] < 0 and passable[i + 1]:
+                distance[i + 1] = d
+                queue.append(i + 1)
+            if i >= width and distance[i - width] < 0 and passable[i - width]:
+                distance[i - width] = d
+                queue.append(i - width)
+            if i < last_row and distance[i + width] < 0 and passable[i + width]:
+                distance[i + width] = d
+                queue.append(i + width)
+        self.distance = distance
+
+    # Unit vector toward the next tile on the way to the target,
+    # None when the position is off the field or already on the target tile
+    def direction(self, x, y):
+        distance = self.distance
+        if distance is None:
+            return None
+        passable = self.passable
+        width, height = self.width, self.height
+        tile_size = self.tile_size
+        tile_x = int(x // tile_size)
+        tile_y = int(y // tile_size)
+        if not (0 <= tile_x < width and 0 <= tile_y < height):
+            return None
+        best = distance[tile_y * width + tile_x]
+        if best <= 0:
+            return None
+        step = None
+        for dx, dy in NEIGHBORS:
+            nx = tile_x + dx
+            ny = tile_y + dy
+            if not (0 <= nx < width and 0 <= ny < height):
+                continue
+            d = distance[ny * width + nx]
+            if 0 <= d < best:
+                if dx and dy and not (passable[tile_y * width + nx] and passable[ny * width + tile_x]):
+                    continue  # 不穿过墙角
+                best = d
+                step = (dx, dy)
+        if step is None:
+            return None
+        # steer at the center of the next tile
+        dx = (tile_x + step[0] + 0.5) * tile_size - x
+        dy = (tile_y + step[1] + 0.5) * tile_size - y
+        length = (dx * dx + dy * dy) ** 0.5
+        if length == 0:
+            return None
+        return (dx / length, dy / length)
+
+
+# Straight 8-connected tile path inside an open rectangle, diagonal steps first
+def _straight_path(start, goal):
+    x, y = start
+    path = [start]
+    while (x, y) != goal:
+        x += (goal[0] > x) - (goal[0] < x)
+        y += (goal[1] > y) - (goal[1] < y)
+        path.append((x, y))
+    return path
+
+# Append a segment to a path, the shared joint tile is kept once
+def _extend_path(path, segment):
+    if path and segment and path[-1] == segment[0]:
+        path.extend(segment[1:])
+    else:
+        path.extend(segment)
+
+# Plain A* over a tile grid, 4-neighbour moves, for queries that start or end outside the rooms
+def grid_path(nav_grid, start, goal):
+    width, height = nav_grid.width, nav_grid.height
+    solid = nav_grid.collision_map.bits
+    if solid[start[1] * width + start[0]] or solid[goal[1] * width + goal[0]]:
+        return None
+    came_from = {start: None}
+    cost = {start: 0}
+    queue = [(0, start)]
+    while queue:
+        _, tile = heapq.heappop(queue)
+        if tile == goal:
+            path = []
+            while tile is not None:
+                path.append(tile)
+                tile = came_from[tile]
+            return path[::-1]
+        x, y = tile
+        new_cost = cost[tile] + 1
+        for nx, ny in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+            if 0 <= nx < width and 0 <= ny < height and not solid[ny * width + nx]:
+                if new_cost < cost.get((nx, ny), new_cost + 1):
+                    cost[(nx, ny)] = new_cost
+                    came_from[(nx, ny)] = tile
+                    heapq.heappush(queue, (new_cost + abs(goal[0] - nx) + abs(goal[1] - ny), (nx, ny)))
+    return None
+
+# Hierarchical navigation over World rooms and squares: portals joined by corridor edges,
+# long paths are searched on the small portal graph and expanded from precomputed segments
+class RoomGraph:
+    def __init__(self, world, cache_size=MAX_CACHED_PATHS):
+        self.world = world
+        self.areas = [(x, y, w, h) for x, y, w, h, _ in world.rooms + world.squares]
+        self.cache_size = cache_size
+        self.cache = OrderedDict()  # (start, goal) -> tile path
+        self.hits = 0
+        self.misses = 0
+        self.build()
+
+    # Index of the room or square containing a tile, None in corridors
+    def area_at(self, tile):
+        x, y = tile
+        if 0 <= x < self.world.width and 0 <= y < self.world.height:
+            return self.area_grid[y][x]
+        return None
+
+    # Build portals, corridor edges and intra-room edges, call again after the world changed
+    def build(self):
+        world = self.world
+        width, height = world.width, world.height
+        self.area_grid = [[None] * width for _ in range(height)]
+        for index, (x, y, w, h) in enumerate(self.areas):
+            for ry in range(y, y + h):
+                row = self.area_grid[ry]
+                for rx in range(x, x + w):
+                    row[rx] = index
+
+        self.portals = {}  # portal tile -> area index
+        self.edges = {}  # portal tile -> [(portal tile, cost, tile path)]
+        self.area_portals = [[] for _ in self.areas]
+        for index in range(len(self.areas)):
+            for a, b, path in self._corridors_from(index):
+                self._add_portal(a, index)
+                self._add_portal(b, self.area_grid[b[1]][b[0]])
+                self._add_edge(a, b, path)
+
+        # 同一房间内的门户之间直线相连
+        for portals in self.area_portals:
+            for i, a in enumerate(portals):
+                for b in portals[i + 1:]:
+                    self._add_edge(a, b, _straight_path(a, b))
+        self.cache.clear()
+
+    def _add_portal(self, tile, area):
+        if tile not in self.portals:
+            self.portals[tile] = area
+            self.area_portals[area].append(tile)
+            self.edges[tile] = []
+
+    def _add_edge(self, a, b, path):
+        cost = len(path) - 1
+        self.edges[a].append((b, cost, path))
+        self.edges[b].append((a, cost, path[::-1]))
+
+    # Breadth-first search from every tile of an area through corridor tiles,
+    # the first contact with each other area gives one corridor edge
+    def _corridors_from(self, index):
+        world = self.world
+        width, height = world.width, world.height
+        solid = world.collision_map.bits
+        area_grid = self.area_grid
+        x, y, w, h = self.areas[index]
+        parent = {}
+        queue = deque()
+        for ry in range(y, y + h):
+            for rx in range(x, x + w):
+                parent[(rx, ry)] = None
+                queue.append((rx, ry))
+        found = {}
+        while queue:
+            tile = queue.popleft()
+            tx, ty = tile
+            for nx, ny in ((tx + 1, ty), (tx - 1, ty), (tx, ty + 1), (tx, ty - 1)):
+                if not (0 <= nx < width and 0 <= ny < height) or (nx, ny) in parent or solid[ny * width + nx]:
+                    continue
+                other = area_grid[ny][nx]
+                if other is None:
+                    parent[(nx, ny)] = tile
+                    queue.append((nx, ny))
+                elif other != index and other not in found and other > index:
+                    # each pair is found once, from the area with the lower index
+                    path = [(nx, ny), tile]
+                    while parent[path[-1]] is not None:
+                        path.append(parent[path[-1]])
+                    found[other] = path[::-1]
+        return [(path[0], path[-1], path) for path in found.values()]
+
+    # Tile path from start to goal, cached with least recently used eviction
+    def find_path(self, start, goal):
+        key = (start, goal)
+        path = self.cache.get(key)
+        if path is not None:
+            self.hits += 1
+            self.cache.move_to_end(key)
+            return path
+        self.misses += 1
+        path = self._search(start, goal)
+        if path is not None:
+            self.cache[key] = path
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return path
+
+    def _search(self, start, goal):
+        start_area = self.area_at(start)
+        goal_area = self.area_at(goal)
+        if start_area is None or goal_area is None:
+            return grid_path(self.world, start, goal)
+        if start_area == goal_area:
+            return _straight_path(start, goal)
+
+        # Dijkstra over the portal graph, start and goal join the portals of their areas
+        goal_links = {portal: _straight_path(portal, goal) for portal in self.area_portals[goal_area]}
+        best = {start: 0}
+        came_from = {start: (None, None)}
+        queue = [(0, start)]
+        while queue:
+            cost, node = heapq.heappop(queue)
+            if node == goal:
+                break
+            if cost > best.get(node, cost):
+                continue
+            links = self.edges.get(node, [])
+            if node == start:
+                links = links + [(portal, len(path) - 1, path) for portal, path in
+                                 ((portal, _straight_path(start, portal)) for portal in self.area_portals[start_area])]
+            if node in goal_links:
+                links = links + [(goal, len(goal_links[node]) - 1, goal_links[node])]
+            for neighbor, step_cost, path in links:
+                new_cost = cost + step_cost
+                if new_cost < best.get(neighbor, new_cost + 1):
+                    best[neighbor] = new_cost
+                    came_from[neighbor] = (node, path)
+                    heapq.heappush(queue, (new_cost, neighbor))
+        if goal not in came_from:
+            return None
+
+        segments = []
+        node = goal
+        while node != start:
+            node, path = came_from[node]
+            segments.append(path)
+        path = []
+        for segment in reversed(segments):
+            _extend_path(path, segment)
+        return path
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
@@ -1,8 +1,12 @@
 # player.py
 import pygame
 import math
-from constants import MOVE_SPEED
+from constants import MOVE_SPEED, BASE_TICK_RATE, SIM_TICK_RATE
 from render import message_system
+from sprite_cache import rotation_cache
+from logger import get_logger
+
+log = get_logger("player")
 
 # Define the Player class
 class Player:
@@ -13,6 +17,8 @@ class Player:
         self.rect = self.image.get_rect(center=(screen_width // 2, screen_height // 2))  # fix center
         self.world_x = screen_width // 2  # initial position
         self.world_y = screen_height // 2
+        self.prev_world_x = self.world_x  # position at the previous simulation tick, used for render interpolation
+        self.prev_world_y = self.world_y
         self.direction = [0.0, 0.0]
         self.last_direction = [1.0, 0.0]
         self.angle = 0.0
@@ -65,16 +71,26 @@ class Player:
         self.damage_multiplier = 1.0  # 伤害倍数，用于double_damage技能
 
         self.last_damage_time = 0  # 上次受伤时间
+        self.last_shot_time = 0  # 上次射击时间
         self.armor_recovery_cooldown = 3000  # 护甲恢复冷却时间（毫秒）
         self.armor_recovery_rate = 1.0  # 护甲恢复速度（每秒）
         self.last_armor_recovery_time = 0  # 上次护甲恢复时间
         self.armor_recovery_interval = 1000  # 护甲恢复间隔（毫秒）
 
-    # update player
-    def update(self, keys, current_time, mouse_pos=None):
+    # Remember the current position as the start of the next interpolation
+    def save_previous_position(self):
+        self.prev_world_x = self.world_x
+        self.prev_world_y = self.world_y
+
+    # Position between the previous and the current tick, alpha in [0, 1]
+    def render_position(self, alpha):
+        return (self.prev_world_x + (self.world_x - self.prev_world_x) * alpha,
+                self.prev_world_y + (self.world_y - self.prev_world_y) * alpha)
+
+    # update player, dt is the simulation step in seconds
+    def update(self, keys, current_time, mouse_pos=None, dt=1.0 / SIM_TICK_RATE, collision_map=None):
         move_x = 0.0
         move_y = 0.0
-        dt = 0.016  # 假设60FPS，每帧约16ms
 
         # 处理技能
         if keys[pygame.K_f] and self.active_skill is None:
@@ -84,7 +100,7 @@ class Player:
         if self.active_skill:
             skill = self.skills[self.active_skill]
             if skill["active"]:
-                skill["timer"] -= 16  # 假设16ms一帧
+                skill["timer"] -= dt * 1000
                 if skill["timer"] <= 0:
                     skill["active"] = False
                     self.active_skill = None
@@ -106,10 +122,16 @@ class Player:
             length = math.sqrt(move_x ** 2 + move_y ** 2)
             self.direction = [move_x / length, move_y / length]
             self.last_direction = self.direction[:]  # update last direction
-            new_x = self.world_x + self.direction[0] * MOVE_SPEED
-            new_y = self.world_y + self.direction[1] * MOVE_SPEED
-            self.world_x = max(self.tile_size, min(new_x, self.screen_width - self.tile_size))
-            self.world_y = max(self.tile_size, min(new_y, self.screen_height - self.tile_size))
+            step = MOVE_SPEED * BASE_TICK_RATE * dt
+            if collision_map is not None:
+                # 碰到墙壁时沿墙滑动
+                self.world_x, self.world_y = collision_map.move_circle(self.world_x, self.world_y, self.direction[0] * step,
+                                                                       self.direction[1] * step, self.collision_radius)
+            else:
+                new_x = self.world_x + self.direction[0] * step
+                new_y = self.world_y + self.direction[1] * step
+                self.world_x = max(self.tile_size, min(new_x, self.screen_width - self.tile_size))
+                self.world_y = max(self.tile_size, min(new_y, self.screen_height - self.tile_size))
 
         # 使用鼠标位置计算射击方向
         if mouse_pos:
@@ -123,7 +145,7 @@ class Player:
             self.angle = math.degrees(math.atan2(-self.direction[1], self.direction[0]))
 
         # 更新图像旋转
-        self.image = pygame.transform.rotate(self.image_original, self.angle)
+        self.image = rotation_cache.get(self.image_original, self.angle)
         self.rect = self.image.get_rect(center=(self.screen_width // 2, self.screen_height // 2))
 
         # rect keep center
@@ -134,7 +156,7 @@ class Player:
             if current_time - self.last_armor_recovery_time >= self.armor_recovery_interval:
                 self.armor = min(self.max_armor, self.armor + 1)  # 每秒恢复1点护甲
                 self.last_armor_recovery_time = current_time
-                print(f"Armor recovered to {int(self.armor)}")
+                log.debug("Armor recovered to %d", self.armor)
         
         return True
 
@@ -169,7 +191,7 @@ class Player:
 
     # draw player
     def draw(self, win):
-        win.blit(self.image, self.rect)
+        return win.blit(self.image, self.rect)
     # add batteries
     def add_batteries(self, amount):
         space_left = self.backpack_capacity - self.backpack_used
@@ -186,26 +208,26 @@ class Player:
         return removed  # Returns the actual amount of batteries removed
     
     # take damage
-    def take_damage(self, amount):
-        """处理玩家受伤"""
-        print(f"Player taking damage: {amount}, current HP: {self.hp}, current Armor: {self.armor}")
-        self.last_damage_time = pygame.time.get_ticks()  # 更新最后受伤时间
+    def take_damage(self, amount, current_time=None):
+        """处理玩家受伤，current_time为模拟时间（毫秒），不传时使用真实时间"""
+        log.debug("Player taking damage: %s, current HP: %s, current Armor: %s", amount, self.hp, self.armor)
+        self.last_damage_time = pygame.time.get_ticks() if current_time is None else current_time  # 更新最后受伤时间
         
         # 先减少护甲
         if self.armor > 0:
             armor_damage = min(amount, self.armor)
             self.armor -= armor_damage
             amount -= armor_damage
-            print(f"Armor reduced by {armor_damage}, remaining: {self.armor}")
+            log.debug("Armor reduced by %s, remaining: %s", armor_damage, self.armor)
 
         # 如果还有剩余伤害，减少HP
         if amount > 0:
             self.hp = max(0, self.hp - amount)
-            print(f"HP reduced by {amount}, remaining: {self.hp}")
+            log.debug("HP reduced by %s, remaining: %s", amount, self.hp)
             
         # 返回玩家是否存活
         is_alive = self.hp > 0
-        print(f"Player alive status: {is_alive}")
+        log.debug("Player alive status: %s", is_alive)
         return is_alive
     
     # use energy
@@ -225,15 +247,15 @@ class Player:
     def add_experience(self, amount):
         """添加经验值"""
         self.current_level_experience += amount
-        print(f"获得 {amount} 点经验值，当前关卡经验：{self.current_level_experience}")
+        log.info("获得 %s 点经验值，当前关卡经验：%s", amount, self.current_level_experience)
 
     def save_experience(self):
         """保存当前关卡获得的经验值"""
         self.experience += self.current_level_experience
-        print(f"保存 {self.current_level_experience} 点经验值，总经验：{self.experience}")
+        log.info("保存 %s 点经验值，总经验：%s", self.current_level_experience, self.experience)
         self.current_level_experience = 0
 
     def lose_experience(self):
         """失去当前关卡获得的经验值"""
-        print(f"失去 {self.current_level_experience} 点经验值")
+        log.info("失去 %s 点经验值", self.current_level_experience)
         self.current_level_experience = 0
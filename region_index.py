@@ -0,0 +1,44 @@
+# region_index.py
+import numpy as np
+from spatial_hash import cell_key
+
+REGION_CELL_SIZE = 128  # coarse grid cell size (px)
+
+# Coarse grid over axis-aligned regions, answers "which region is this point in" in O(1)
+class RegionIndex:
+    def __init__(self, cell_size=REGION_CELL_SIZE):
+        self.cell_size = cell_size
+        self.regions = []  # (region id, left, top, right, bottom), bounds inclusive
+        self.cells = {}  # cell key -> region positions overlapping the cell, in insertion order
+
+    # Add a region, where regions overlap the one added first wins
+    def add(self, region_id, left, top, right, bottom):
+        index = len(self.regions)
+        self.regions.append((region_id, left, top, right, bottom))
+        size = self.cell_size
+        for cell_x in range(int(left // size), int(right // size) + 1):
+            for cell_y in range(int(top // size), int(bottom // size) + 1):
+                self.cells.setdefault(cell_key(cell_x, cell_y), []).append(index)
+
+    # Region id at a point, default outside every region
+    def lookup(self, x, y, default=None):
+        size = self.cell_size
+        for index in self.cells.get(cell_key(int(x // size), int(y // size)), ()):
+            region_id, left, top, right, bottom = self.regions[index]
+            if left <= x <= right and top <= y <= bottom:
+                return region_id
+        return default
+
+    # Region positions of many points at once, -1 outside every region
+    def lookup_many(self, x, y):
+        result = np.full(len(x), -1, dtype=np.intp)
+        # 倒序赋值，先加入的区域最后写入，与lookup的优先级一致
+        for index in range(len(self.regions) - 1, -1, -1):
+            _, left, top, right, bottom = self.regions[index]
+            result[(x >= left) & (x <= right) & (y >= top) & (y <= bottom)] = index
+        return result
+
+    # Mask of the points that lie in one of the given regions
+    def contains_many(self, x, y, region_ids):
+        positions = [index for index, region in enumerate(self.regions) if region[0] in region_ids]
+        return np.isin(self.lookup_many(x, y), positions)
@@ -1,59 +1,98 @@
 # render.py
 import pygame
+from collections import OrderedDict
 from bullet import draw_bullets
 from world_beta import WorldBeta
+from background import background_cache
+from text_cache import text_cache
+from timer_wheel import TimerWheel
+from logger import get_logger
+
+log = get_logger("render")
+
+MAX_VISIBLE_MESSAGES = 3  # 最多显示3条消息
+MAX_MESSAGE_KEYS = 64  # 冷却中的消息键上限
 
 class MessageSystem:
     def __init__(self):
-        self.messages = []
-        self.message_timers = {}
+        self.messages = []  # [text, surface]，surface在插入时渲染
         self.message_duration = 3000  # 消息显示时间（毫秒）
-        self.last_message_time = 0
         self.message_cooldown = 1000  # 相同消息的冷却时间（毫秒）
+        self.cooldowns = OrderedDict()  # 冷却中的消息 -> 冷却结束时间，过期由时间轮删除
+        self.timers = TimerWheel(pygame.time.get_ticks())
+        self.font = None  # 第一次绘制时记录，之后的消息在插入时就渲染
         self.energy_warning_active = False
-        self.energy_warning_timer = 0
+        self.energy_warning_end = 0
         self.energy_warning_duration = 2000
+        self.energy_warning_surface = None
 
     def add_message(self, message):
         current_time = pygame.time.get_ticks()
-        if message not in self.message_timers or current_time - self.message_timers[message] > self.message_cooldown:
-            self.messages.append(message)
-            self.message_timers[message] = current_time
-            if len(self.messages) > 3:  # 最多显示3条消息
-                self.messages.pop(0)
+        self.update()
+        if message in self.cooldowns:
+            return
+        self.cooldowns[message] = current_time + self.message_cooldown
+        if len(self.cooldowns) > MAX_MESSAGE_KEYS:
+            self.cooldowns.popitem(last=False)
+        self.timers.schedule(current_time + self.message_cooldown, ("cooldown", message))
+
+        entry = [message, self._render(message, (255, 255, 255))]
+        self.messages.append(entry)
+        if len(self.messages) > MAX_VISIBLE_MESSAGES:
+            self.messages.pop(0)
+        self.timers.schedule(current_time + self.message_duration, ("expire", entry))
 
     def add_energy_warning(self):
+        current_time = pygame.time.get_ticks()
         self.energy_warning_active = True
-        self.energy_warning_timer = self.energy_warning_duration
+        self.energy_warning_end = current_time + self.energy_warning_duration
+        self.timers.schedule(self.energy_warning_end, ("energy_warning", None))
 
+    def _render(self, message, color):
+        return text_cache.render(self.font, message, True, color) if self.font is not None else None
+
+    # 处理到期的计时器，按真实时间计算
     def update(self):
         current_time = pygame.time.get_ticks()
-        self.messages = [msg for msg in self.messages 
-                        if current_time - self.message_timers[msg] < self.message_duration]
-        
-        if self.energy_warning_active:
-            self.energy_warning_timer -= 16
-            if self.energy_warning_timer <= 0:
-                self.energy_warning_active = False
+        for kind, value in self.timers.advance(current_time):
+            if kind == "expire":
+                # 按对象比较，相同文字的消息各自到期
+                self.messages = [entry for entry in self.messages if entry is not value]
+            elif kind == "cooldown":
+                # 冷却期间被挤出上限后又重新加入的消息，以最新的结束时间为准
+                if self.cooldowns.get(value, current_time + 1) <= current_time:
+                    del self.cooldowns[value]
+            elif kind == "energy_warning":
+                if current_time >= self.energy_warning_end:
+                    self.energy_warning_active = False
 
     def draw(self, win, font):
+        if font is not self.font:
+            self.font = font
+            for entry in self.messages:
+                entry[1] = None
+            self.energy_warning_surface = None
+        dirty_rects = []
         y_offset = 100
-        for message in self.messages:
-            text_surface = font.render(message, True, (255, 255, 255))
-            win.blit(text_surface, (10, y_offset))
+        for entry in self.messages:
+            if entry[1] is None:
+                entry[1] = self._render(entry[0], (255, 255, 255))
+            dirty_rects.append(win.blit(entry[1], (10, y_offset)))
             y_offset += 30
 
         if self.energy_warning_active:
-            warning_text = "ENERGY DEPLETED!"
-            text_surface = font.render(warning_text, True, (255, 0, 0))
-            text_rect = text_surface.get_rect(center=(win.get_width() // 2, 50))
-            win.blit(text_surface, text_rect)
+            if self.energy_warning_surface is None:
+                self.energy_warning_surface = self._render("ENERGY DEPLETED!", (255, 0, 0))
+            text_rect = self.energy_warning_surface.get_rect(center=(win.get_width() // 2, 50))
+            dirty_rects.append(win.blit(self.energy_warning_surface, text_rect))
+        return dirty_rects
 
 # 创建全局消息系统实例
 message_system = MessageSystem()
 
 # 绘制技能冷却UI
 def draw_skill_cooldown(win, font, player, current_time, screen_width):
+    dirty_rects = []
     # Dash技能UI位置 - 统一x轴位置
     dash_x = screen_width - 400
     dash_y = 130  # 调整为与能量显示保持40像素间距
@@ -62,9 +101,9 @@ def draw_skill_cooldown(win, font, player, current_time, screen_width):
     rect_spacing = 5
     
     # 绘制技能名称
-    skill_text = font.render("Dash:", True, (255, 255, 255))
+    skill_text = text_cache.render(font, "Dash:", True, (255, 255, 255))
     text_width = skill_text.get_width()
-    win.blit(skill_text, (dash_x, dash_y))
+    dirty_rects.append(win.blit(skill_text, (dash_x, dash_y)))
     
     # 获取dash技能信息
     dash_skill = player.skills["dash"]
@@ -80,94 +119,99 @@ def draw_skill_cooldown(win, font, player, current_time, screen_width):
         rect = pygame.Rect(rect_start_x + i * (rect_width + rect_spacing), 
                          dash_y + 2, rect_width, rect_height)
         if i < filled_rects:
-            pygame.draw.rect(win, (0, 255, 0), rect)
+            dirty_rects.append(pygame.draw.rect(win, (0, 255, 0), rect))
         else:
-            pygame.draw.rect(win, (100, 100, 100), rect, 2)
+            dirty_rects.append(pygame.draw.rect(win, (100, 100, 100), rect, 2))
     
     # 如果技能可用，显示Complete提示（居中对齐）
     if cooldown_remaining <= 0:
-        complete_text = font.render("Complete", True, (0, 255, 0))
+        complete_text = text_cache.render(font, "Complete", True, (0, 255, 0))
         complete_width = complete_text.get_width()
         complete_x = rect_start_x + (total_rect_width - complete_width) // 2
-        win.blit(complete_text, (complete_x, dash_y + rect_height + 8))
+        dirty_rects.append(win.blit(complete_text, (complete_x, dash_y + rect_height + 8)))
+    return dirty_rects
 
+# 绘制HUD，返回本帧变化的矩形区域
 def draw_hud(win, font, player, screen_width):
+    dirty_rects = []
     # 绘制背包信息
-    backpack_text = font.render(f"Batteries in Backpack: {player.backpack.get('batteries', 0)}/{player.backpack_capacity}", True, (255, 255, 255))
-    win.blit(backpack_text, (10, 10))
+    backpack_text = text_cache.render(font, f"Batteries in Backpack: {player.backpack.get('batteries', 0)}/{player.backpack_capacity}", True, (255, 255, 255))
+    dirty_rects.append(win.blit(backpack_text, (10, 10)))
     
     # 绘制经验值信息
-    experience_text = font.render(f"Experience gained: {player.current_level_experience}", True, (255, 215, 0))  # 金色
-    win.blit(experience_text, (10, 50))  # 在背包信息下方40像素处
+    experience_text = text_cache.render(font, f"Experience gained: {player.current_level_experience}", True, (255, 215, 0))  # 金色
+    dirty_rects.append(win.blit(experience_text, (10, 50)))  # 在背包信息下方40像素处
     
     # 绘制状态信息（右上角）- 统一x轴位置
     status_x = screen_width - 400
     
     # 绘制生命值
-    hp_text = font.render(f"HP: {int(player.hp)}/{player.max_hp}", True, (255, 0, 0))
-    win.blit(hp_text, (status_x, 10))
+    hp_text = text_cache.render(font, f"HP: {int(player.hp)}/{player.max_hp}", True, (255, 0, 0))
+    dirty_rects.append(win.blit(hp_text, (status_x, 10)))
     
     # 绘制护甲值 - 40像素间距
-    armor_text = font.render(f"Armor: {int(player.armor)}/{player.max_armor}", True, (128, 128, 128))
-    win.blit(armor_text, (status_x, 50))
+    armor_text = text_cache.render(font, f"Armor: {int(player.armor)}/{player.max_armor}", True, (128, 128, 128))
+    dirty_rects.append(win.blit(armor_text, (status_x, 50)))
     
     # 绘制能量值 - 40像素间距
-    energy_text = font.render(f"Energy: {int(player.energy)}/{player.max_energy}", True, (0, 255, 255))
-    win.blit(energy_text, (status_x, 90))
+    energy_text = text_cache.render(font, f"Energy: {int(player.energy)}/{player.max_energy}", True, (0, 255, 255))
+    dirty_rects.append(win.blit(energy_text, (status_x, 90)))
     
     # 更新并绘制消息
     message_system.update()
-    message_system.draw(win, font)
+    dirty_rects += message_system.draw(win, font)
     
     # 绘制技能冷却UI
     current_time = pygame.time.get_ticks()
-    draw_skill_cooldown(win, font, player, current_time, screen_width)
+    dirty_rects += draw_skill_cooldown(win, font, player, current_time, screen_width)
+    return dirty_rects
 
 # 绘制开始大厅
-def draw_start_hall(win, red, font, screen_width, screen_height, images, start_hall, player, bullets, camera_offset, enemies, enemy_bullets):
+def draw_start_hall(win, red, font, screen_width, screen_height, images, start_hall, player, bullets, camera_offset, enemies, enemy_bullets, camera=None, alpha=1.0):
     win.fill((0, 0, 0))
-    start_hall.draw(win, images, camera_offset)
+    dirty_rects = start_hall.draw(win, images, camera_offset)
     for enemy in enemies:
-        enemy.draw(win, camera_offset)
-    player.draw(win)
-    draw_bullets(bullets, images.get("bullet_original"), win, camera_offset, images.get("enemy_bullet"))
-    draw_bullets(enemy_bullets, images.get("bullet_original"), win, camera_offset, images.get("enemy_bullet"))
-    draw_hud(win, font, player, screen_width)
+        dirty_rects.append(enemy.draw(win, camera_offset, camera, alpha))
+    dirty_rects.append(player.draw(win))
+    dirty_rects += draw_bullets(bullets, images.get("bullet"), win, camera_offset, images.get("enemy_bullet"), camera, alpha)
+    dirty_rects += draw_bullets(enemy_bullets, images.get("bullet"), win, camera_offset, images.get("enemy_bullet"), camera, alpha)
+    dirty_rects += draw_hud(win, font, player, screen_width)
     
     # Gate interaction text
     gate_x = start_hall.gate_pos[0] * start_hall.tile_size + start_hall.tile_size // 2
     gate_y = start_hall.gate_pos[1] * start_hall.tile_size + start_hall.tile_size // 2
     if (abs(player.world_x - gate_x) < start_hall.tile_size * 1.5 and 
         abs(player.world_y - gate_y) < start_hall.tile_size * 1.5):
-        text_surface = font.render("Press E to start...", True, red)
+        text_surface = text_cache.render(font, "Press E to start...", True, red)
         text_rect = text_surface.get_rect(center=(screen_width // 2, screen_height - 100))
-        win.blit(text_surface, text_rect)
+        dirty_rects.append(win.blit(text_surface, text_rect))
     
     # Battery interaction text
     battery_x = start_hall.battery_pos[0] * start_hall.tile_size + start_hall.tile_size // 2
     battery_y = start_hall.battery_pos[1] * start_hall.tile_size + start_hall.tile_size // 2
     if (abs(player.world_x - battery_x) < start_hall.tile_size * 1.5 and 
         abs(player.world_y - battery_y) < start_hall.tile_size * 1.5):
-        text_surface = font.render("Press E to interact", True, red)
+        text_surface = text_cache.render(font, "Press E to interact", True, red)
         text_rect = text_surface.get_rect(center=(screen_width // 2, screen_height - 130))
-        win.blit(text_surface, text_rect)
+        dirty_rects.append(win.blit(text_surface, text_rect))
 
     # Property tree interaction text
     tree_x = start_hall.property_tree_pos[0] * start_hall.tile_size + start_hall.tile_size // 2
     tree_y = start_hall.property_tree_pos[1] * start_hall.tile_size + start_hall.tile_size // 2
     if (abs(player.world_x - tree_x) < start_hall.tile_size * 1.5 and 
         abs(player.world_y - tree_y) < start_hall.tile_size * 1.5):
-        text_surface = font.render("Press E to interact", True, red)
+        text_surface = text_cache.render(font, "Press E to interact", True, red)
         text_rect = text_surface.get_rect(center=(screen_width // 2, screen_height - 160))
-        win.blit(text_surface, text_rect)
+        dirty_rects.append(win.blit(text_surface, text_rect))
+    return dirty_rects
 
 # 绘制主关卡
-def draw_main_level(win, images, player, bullets, camera_offset, font, screen_width, screen_height, enemies, enemy_bullets, world_beta):
+def draw_main_level(win, images, player, bullets, camera_offset, font, screen_width, screen_height, enemies, enemy_bullets, world_beta, camera=None, alpha=1.0):
     win.fill((0, 0, 0))
+    dirty_rects = []
     
     # 获取玩家当前所在的区域
     current_area = world_beta.get_current_area(player.world_x, player.world_y)
-    print(f"Current area: {current_area}, Player position: ({player.world_x}, {player.world_y})")
     
     # 根据当前区域选择背景
     if isinstance(current_area, int) and current_area in world_beta.levels:
@@ -175,20 +219,21 @@ def draw_main_level(win, images, player, bullets, camera_offset, font, screen_wi
         level = world_beta.levels[current_area]
         background_key = level["background"]
         if background_key in images:
-            # 直接使用屏幕大小作为背景大小
-            scaled_bg = pygame.transform.scale(images[background_key], (screen_width, screen_height))
+            # 直接使用屏幕大小作为背景大小（只缩放一次）
+            scaled_bg = background_cache.get_scaled(images[background_key], (screen_width, screen_height))
             
             # 计算背景位置（相对于玩家位置）
             x = camera_offset[0]
             y = camera_offset[1]
             
-            win.blit(scaled_bg, (x, y))
-            print(f"Drawing background {background_key} at ({x}, {y})")
+            # 只绘制视口内的部分
+            background_cache.blit_viewport(win, scaled_bg, (x, y))
+            log.debug("Drawing background %s at (%s, %s)", background_key, x, y)
 
             # 在背景右侧绘制门
             if "gate_open" in images:
                 gate_size = 200  # 门的大小
-                gate = pygame.transform.scale(images["gate_open"], (gate_size, gate_size))
+                gate = background_cache.get_scaled(images["gate_open"], (gate_size, gate_size))
                 gate_x = screen_width - gate_size + camera_offset[0]
                 gate_y = screen_height // 2 - gate_size // 2 + camera_offset[1]
                 win.blit(gate, (gate_x, gate_y))
@@ -199,12 +244,12 @@ def draw_main_level(win, images, player, bullets, camera_offset, font, screen_wi
                 if (abs(player_screen_x - (screen_width - gate_size)) < 100 and 
                     abs(player_screen_y - (screen_height // 2)) < 100):
                     # 显示交互提示
-                    text = font.render("Press E to enter safe zone", True, (255, 255, 255))
+                    text = text_cache.render(font, "Press E to enter safe zone", True, (255, 255, 255))
                     text_rect = text.get_rect(center=(screen_width // 2, screen_height - 100))
-                    win.blit(text, text_rect)
+                    dirty_rects.append(win.blit(text, text_rect))
 
         else:
-            print(f"Warning: Background image '{background_key}' not found!")
+            log.warning("Background image '%s' not found!", background_key)
     elif isinstance(current_area, str) and "corridor" in current_area:
         # 如果是走廊，使用走廊背景
         corridor = world_beta.corridors[current_area]
@@ -216,26 +261,25 @@ def draw_main_level(win, images, player, bullets, camera_offset, font, screen_wi
             corridor_height = corridor["width"]
             
             # 缩放走廊背景
-            scaled_corridor = pygame.transform.scale(images["corridor"], (corridor_width, corridor_height))
-            win.blit(scaled_corridor, (corridor_x, corridor_y))
+            scaled_corridor = background_cache.get_scaled(images["corridor"], (corridor_width, corridor_height))
+            background_cache.blit_viewport(win, scaled_corridor, (corridor_x, corridor_y))
             
             # 在走廊两端绘制门
             if "gate_open" in images:
                 gate_size = corridor_height
-                gate_left = pygame.transform.scale(images["gate_open"], (gate_size, gate_size))
-                gate_right = pygame.transform.scale(images["gate_open"], (gate_size, gate_size))
+                gate = background_cache.get_scaled(images["gate_open"], (gate_size, gate_size))
                 
                 # 绘制左门和右门
-                win.blit(gate_left, (corridor_x, corridor_y))
-                win.blit(gate_right, (corridor_x + corridor_width - gate_size, corridor_y))
+                win.blit(gate, (corridor_x, corridor_y))
+                win.blit(gate, (corridor_x + corridor_width - gate_size, corridor_y))
 
                 # 检查玩家是否靠近左门
                 if (abs(player.world_x - corridor["start"][0]) < 100 and 
                     abs(player.world_y - corridor["start"][1]) < 100):
                     # 显示交互提示
-                    text = font.render("Press E to return", True, (255, 255, 255))
+                    text = text_cache.render(font, "Press E to return", True, (255, 255, 255))
                     text_rect = text.get_rect(center=(screen_width // 2, screen_height - 100))
-                    win.blit(text, text_rect)
+                    dirty_rects.append(win.blit(text, text_rect))
                 # 检查玩家是否靠近右门
                 elif (abs(player.world_x - corridor["end"][0]) < 100 and 
                       abs(player.world_y - corridor["end"][1]) < 100):
@@ -244,38 +288,54 @@ def draw_main_level(win, images, player, bullets, camera_offset, font, screen_wi
                     if len(level_parts) == 3:
                         from_level = int(level_parts[1])
                         if world_beta.levels[from_level]["cleared"]:
-                            text = font.render("Press E to proceed", True, (255, 255, 255))
+                            text = text_cache.render(font, "Press E to proceed", True, (255, 255, 255))
                         else:
-                            text = font.render("Clear current level to proceed", True, (255, 0, 0))
+                            text = text_cache.render(font, "Clear current level to proceed", True, (255, 0, 0))
                         text_rect = text.get_rect(center=(screen_width // 2, screen_height - 100))
-                        win.blit(text, text_rect)
+                        dirty_rects.append(win.blit(text, text_rect))
         else:
-            print("Warning: Corridor background image not found!")
+            log.warning("Corridor background image not found!")
     
     # 绘制敌人
     for enemy in enemies:
-        enemy.draw(win, camera_offset)
+        dirty_rects.append(enemy.draw(win, camera_offset, camera, alpha))
     
     # 绘制玩家
-    player.draw(win)
+    dirty_rects.append(player.draw(win))
     
     # 绘制子弹
-    draw_bullets(bullets, images.get("bullet_original"), win, camera_offset, images.get("enemy_bullet"))
-    draw_bullets(enemy_bullets, images.get("bullet_original"), win, camera_offset, images.get("enemy_bullet"))
+    dirty_rects += draw_bullets(bullets, images.get("bullet"), win, camera_offset, images.get("enemy_bullet"), camera, alpha)
+    dirty_rects += draw_bullets(enemy_bullets, images.get("bullet"), win, camera_offset, images.get("enemy_bullet"), camera, alpha)
     
     # 绘制HUD
-    draw_hud(win, font, player, screen_width)
+    dirty_rects += draw_hud(win, font, player, screen_width)
     
     # 如果当前在Boss关，显示Boss警告
     if current_area in world_beta.levels and world_beta.levels[current_area]["is_boss"]:
-        boss_warning = font.render("BOSS LEVEL!", True, (255, 0, 0))
+        boss_warning = text_cache.render(font, "BOSS LEVEL!", True, (255, 0, 0))
         warning_rect = boss_warning.get_rect(center=(screen_width // 2, 50))
-        win.blit(boss_warning, warning_rect)
+        dirty_rects.append(win.blit(boss_warning, warning_rect))
+    return dirty_rects
+
+# 绘制性能统计（可见/被剔除的实体数量和文字缓存命中率）
+def draw_stats_overlay(win, font, camera, clock=None):
+    dirty_rects = []
+    lines = []
+    if clock is not None:
+        lines.append(f"FPS: {clock.get_fps():.0f}")
+    for category, (visible, culled) in camera.stats.items():
+        lines.append(f"{category}: {visible} visible / {culled} culled")
+    lines.append(f"Text cache hit rate: {text_cache.hit_rate() * 100:.1f}%")
+    y = win.get_height() - 40 * len(lines) - 10
+    for line in lines:
+        dirty_rects.append(win.blit(text_cache.render(font, line, True, (255, 255, 255)), (10, y)))
+        y += 40
+    return dirty_rects
 
 # 绘制游戏结束界面
 def draw_game_over(win, font, red, screen_width, screen_height):
     win.fill((255, 255, 255))
-    text_surface = font.render("Game over!", True, red)
+    text_surface = text_cache.render(font, "Game over!", True, red)
     text_rect = text_surface.get_rect(center=(screen_width // 2, screen_height // 2))
     win.blit(text_surface, text_rect)
     # 示例：在 draw_game_over 后绘制淡出
\ No newline at end of file
@@ -33,6 +33,20 @@ def check_dependencies():
             print("Please run this script with administrator privileges (e.g., 'sudo python script.py').")
             sys.exit(1)
 
+    # Make sure numpy is installed
+    try:
+        import numpy
+        print("NumPy has been installed, the version is: ", numpy.__version__)
+    except ImportError:
+        print("NumPy not detected, installing...")
+        try:
+            subprocess.check_call([sys.executable, '-m', 'pip', 'install', 'numpy'])
+            print("NumPy installed successfully.")
+        except subprocess.CalledProcessError as e:
+            print(f"Failed to install NumPy: {e}")
+            print("Please run this script with administrator privileges (e.g., 'sudo python script.py').")
+            sys.exit(1)
+
 # Main script
 if __name__ == "__main__":
     check_dependencies()
\ No newline at end of file
@@ -0,0 +1,275 @@
+# simulation.py
+import hashlib
+import random
+import pygame
+from constants import SIM_TICK_RATE, ENERGY_RECOVERY_RATE
+from bullet_pool import BulletPool
+from bullet import shoot_bullet, update_bullets
+from enemy import RangedEnemy, MeleeEnemy, Boss
+from player import Player
+from starthall import StartHall
+from world import World
+from pathfinding import FlowField
+from line_of_sight import LineOfSight
+from ai_scheduler import AIScheduler
+
+SPAWN_CLEARANCE = 48  # free radius required around an enemy spawn, the boss collision radius
+
+# Key state built from simulation inputs, indexable like pygame.key.get_pressed()
+class KeyState:
+    def __init__(self, pressed=()):
+        self.pressed = set(pressed)
+
+    def __getitem__(self, key):
+        return key in self.pressed
+
+# Inputs for one simulation tick
+class SimInput:
+    # keys/mouse_pos: real pygame key state and mouse position, used as-is when given
+    # move: (x, y) movement in [-1, 1], aim: (dx, dy) aim direction relative to the player
+    def __init__(self, keys=None, mouse_pos=None, move=(0, 0), aim=None, fire=False, skill=False,
+                 interact=False, player_locked=False):
+        self.keys = keys
+        self.mouse_pos = mouse_pos
+        self.move = move
+        self.aim = aim
+        self.fire = fire
+        self.skill = skill
+        self.interact = interact
+        self.player_locked = player_locked  # a menu is open, the player does not move
+
+    def key_state(self):
+        if self.keys is not None:
+            return self.keys
+        pressed = []
+        if self.move[0] < 0:
+            pressed.append(pygame.K_a)
+        elif self.move[0] > 0:
+            pressed.append(pygame.K_d)
+        if self.move[1] < 0:
+            pressed.append(pygame.K_w)
+        elif self.move[1] > 0:
+            pressed.append(pygame.K_s)
+        if self.skill:
+            pressed.append(pygame.K_f)
+        if self.interact:
+            pressed.append(pygame.K_e)
+        return KeyState(pressed)
+
+    def aim_position(self, screen_width, screen_height):
+        if self.mouse_pos is not None:
+            return self.mouse_pos
+        if self.aim is not None:
+            return (screen_width // 2 + self.aim[0], screen_height // 2 + self.aim[1])
+        return None
+
+# Game state and rules without any display, stepped at a fixed rate
+class Simulation:
+    def __init__(self, screen_width=1920, screen_height=1080, seed=None, images=None, tick_rate=SIM_TICK_RATE,
+                 player=None, start_hall=None, world=None, enemies=None, bullets=None, enemy_bullets=None,
+                 world_pregen=None):
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.images = images if images is not None else {}
+        self.screen_width = screen_width
+        self.screen_height = screen_height
+        self.world_width = screen_width * 3
+        self.world_height = screen_height * 3
+        self.dt = 1.0 / tick_rate
+        self.tick = 0
+        self.time = 0  # simulation time (ms)
+
+        if player is None:
+            image = self.images.get("player_original") or pygame.Surface((64, 64), pygame.SRCALPHA)
+            player = Player(image, screen_width, screen_height)
+        self.player = player
+        self.start_hall = start_hall if start_hall is not None else StartHall(screen_width, screen_height)
+        # WorldPregenerator, the gate then takes a world built in the background. Only the headless core uses it:
+        # main.py's main level is the fixed layout of main.World, nothing is generated at its gate
+        self.world_pregen = world_pregen
+        if world is None and world_pregen is None:
+            world = World(rng=self.rng)
+        self.world = world
+        if world_pregen is not None:
+            world_pregen.fill()
+        self.enemies = enemies if enemies is not None else []
+        self.bullets = bullets if bullets is not None else BulletPool()
+        self.enemy_bullets = enemy_bullets if enemy_bullets is not None else BulletPool()
+        self.flow_field = FlowField()  # 追击敌人共用的寻路流场
+        self.line_of_sight = LineOfSight()  # 射击敌人共用的视线检测
+        self.ai_scheduler = AIScheduler()  # 远处的敌人降低更新频率
+        self.in_start_hall = True
+        self.game_over = False
+
+    # Tile grid the current level collides and navigates on, None when the level has no grid
+    def navigation_grid(self):
+        level = self.start_hall if self.in_start_hall else self.world
+        return level if getattr(level, "collision_map", None) is not None else None
+
+    # Spawn the enemies of the main level, on the level's spawn points when it has them
+    def spawn_enemies(self):
+        self.enemies.clear()
+        self.enemy_bullets.clear()
+        kinds = (RangedEnemy, RangedEnemy, MeleeEnemy, MeleeEnemy, Boss)
+        positions = self.enemy_spawn_positions(len(kinds))
+        if positions is None:
+            positions = [(1000, 1000), (1200, 1200), (1400, 1400), (1600, 1600), (2000, 2000)]
+        for kind, (x, y) in zip(kinds, positions):
+            self.enemies.append(kind(x, y, self.images, self.rng))
+
+    # Pixel centers of count random spawn tiles of the procedural level, None for levels without spawn points
+    def enemy_spawn_positions(self, count):
+        points = getattr(self.world, "enemy_spawn_points", None)
+        if not points:
+            return None
+        tile_size = self.world.tile_size
+        centers = [((x + 0.5) * tile_size, (y + 0.5) * tile_size) for x, y in points]
+        collision_map = getattr(self.world, "collision_map", None)
+        if collision_map is not None:
+            # 筛掉贴墙的出生点
+            clear = [(x, y) for x, y in centers if not collision_map.circle_hits(x, y, SPAWN_CLEARANCE)]
+            centers = clear or centers
+        if len(centers) >= count:
+            return self.rng.sample(centers, count)
+        return [self.rng.choice(centers) for _ in range(count)]
+
+    # Leave the start hall through the gate
+    def enter_main_level(self):
+        if self.world_pregen is not None:
+            self.world = self.world_pregen.take()
+        self.bullets.clear()
+        self.enemy_bullets.clear()
+        if hasattr(self.world, "get_start_position"):
+            self.player.world_x, self.player.world_y = self.world.get_start_position()
+        else:
+            self.player.world_x = self.world_width // 2
+            self.player.world_y = self.world_height // 2
+        self.player.save_previous_position()
+        self.spawn_enemies()
+        self.in_start_hall = False
+
+    # Advance one tick, returns True if the player is dead
+    def step(self, inputs=None, current_time=None):
+        if self.game_over:
+            return True
+        if inputs is None:
+            inputs = SimInput()
+        self.tick += 1
+        self.time = current_time if current_time is not None else round(self.tick * self.dt * 1000)
+        dt = self.dt
+        player = self.player
+        keys = inputs.key_state()
+        aim = inputs.aim_position(self.screen_width, self.screen_height)
+        start_hall = self.start_hall if self.in_start_hall else None
+
+        nav_grid = self.navigation_grid()
+        collision_map = nav_grid.collision_map if nav_grid is not None else None
+
+        player.save_previous_position()
+        player.recover_energy(ENERGY_RECOVERY_RATE * dt)
+        if not inputs.player_locked:
+            player.update(keys, self.time, aim, dt, collision_map)
+        if inputs.fire and aim is not None:
+            shoot_bullet(player, self.time, aim, 1, self.bullets)
+        if inputs.interact and self.in_start_hall and self.start_hall.check_gate_interaction(player, keys):
+            self.enter_main_level()
+            start_hall = None
+            nav_grid = self.navigation_grid()
+            collision_map = nav_grid.collision_map if nav_grid is not None else None
+
+        if self.flow_field.nav_grid is not nav_grid:
+            self.flow_field.set_grid(nav_grid)
+            self.line_of_sight.set_grid(nav_grid)
+        self.flow_field.update(player.world_x, player.world_y)
+        # 所有射击敌人的视线一次算完
+        shooters = [enemy for enemy in self.enemies if isinstance(enemy, (RangedEnemy, Boss))]
+        visible = self.line_of_sight.can_see_many([(enemy.world_x, enemy.world_y) for enemy in shooters],
+                                                  player.world_x, player.world_y)
+        for enemy, can_see in zip(shooters, visible):
+            enemy.can_see_player = can_see
+        self.ai_scheduler.begin_tick()
+        for enemy in self.enemies[:]:
+            enemy_dt = self.ai_scheduler.due(enemy, player.world_x, player.world_y, dt)
+            if not enemy_dt:
+                # 跳过的tick没有移动，否则渲染插值会一直重放上一段
+                enemy.prev_x, enemy.prev_y = enemy.world_x, enemy.world_y
+            else:
+                enemy.update(enemy_dt, player, self.world_width, self.world_height, self.enemy_bullets, self.time, start_hall,
+                             self.in_start_hall, flow_field=self.flow_field, collision_map=collision_map)
+            if not enemy.alive:
+                self.enemies.remove(enemy)
+        if player.hp <= 0:  # 近战敌人在自己的update里也会造成接触伤害
+            self.game_over = True
+            return True
+
+        world = self.world if hasattr(self.world, "corridor_mask") else None  # 走廊里的子弹会被移除
+        update_bullets(self.bullets, self.world_width, self.world_height, self.time, player, None, None,
+                       start_hall, self.in_start_hall, self.enemies, world, dt=dt, collision_map=collision_map)
+        if update_bullets(self.enemy_bullets, self.world_width, self.world_height, self.time, player, None, None,
+                          start_hall, self.in_start_hall, world=world, dt=dt, collision_map=collision_map):
+            self.game_over = True
+            return True
+
+        # 近战敌人的接触伤害
+        for enemy in self.enemies:
+            if isinstance(enemy, MeleeEnemy) and enemy.alive and self.time - enemy.last_contact_time >= enemy.contact_cooldown:
+                if enemy.rect.colliderect(player.rect):
+                    enemy.last_contact_time = self.time
+                    if not player.take_damage(enemy.contact_damage, self.time):
+                        self.game_over = True
+                        return True
+        return False
+
+    # Stop background work, call this when the simulation is no longer used
+    def close(self):
+        if self.world_pregen is not None:
+            self.world_pregen.shutdown()
+
+    # Run ticks with inputs from input_fn(simulation), stops early on game over
+    def run(self, ticks, input_fn=None):
+        for _ in range(ticks):
+            if self.step(input_fn(self) if input_fn else None):
+                break
+        return self.tick
+
+    # Digest of the game state, equal digests mean equal runs
+    def state_hash(self):
+        digest = hashlib.sha1()
+        player = self.player
+        digest.update(repr((self.tick, self.in_start_hall, self.game_over, player.world_x, player.world_y,
+                            player.hp, player.armor, player.energy)).encode())
+        for enemy in self.enemies:
+            digest.update(repr((type(enemy).__name__, enemy.world_x, enemy.world_y, enemy.hp)).encode())
+        for pool in (self.bullets, self.enemy_bullets):
+            digest.update(pool.x[:len(pool)].tobytes())
+            digest.update(pool.y[:len(pool)].tobytes())
+        return digest.hexdigest()
+
+# Headless benchmark: run the main level with scripted random inputs
+if __name__ == "__main__":
+    import os
+    import sys
+    import time
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+    def scripted_inputs(simulation):
+        rng = simulation.rng
+        return SimInput(move=(rng.choice((-1, 0, 1)), rng.choice((-1, 0, 1))),
+                        aim=(rng.uniform(-100, 100), rng.uniform(-100, 100)),
+                        fire=simulation.tick % 15 == 0)
+
+    # --pregen: take the level from a background WorldPregenerator instead of generating it up front
+    if "--pregen" in sys.argv:
+        from world_pregen import WorldPregenerator
+        simulation = Simulation(seed=1, world_pregen=WorldPregenerator(seed=1))
+        time.sleep(0.5)  # 模拟玩家在大厅里停留
+    else:
+        simulation = Simulation(seed=1)
+    simulation.enter_main_level()
+    start = time.perf_counter()
+    ticks = simulation.run(10000, scripted_inputs)
+    elapsed = time.perf_counter() - start
+    print(f"{ticks} ticks in {elapsed:.2f}s ({ticks / elapsed:.0f} ticks/s), state {simulation.state_hash()}")
+    if simulation.world_pregen is not None:
+        print(f"pre-generated world hit rate {simulation.world_pregen.hit_rate():.0%}")
+    simulation.close()
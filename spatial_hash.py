@@ -0,0 +1,45 @@
+# spatial_hash.py
+import numpy as np
+
+# Pack a cell coordinate into one integer key, works for ints and numpy arrays alike
+def cell_key(cell_x, cell_y):
+    return (cell_x << 32) | (cell_y & 0xFFFFFFFF)
+
+# Uniform grid broad phase, every item is stored in each cell its bounding circle touches
+class SpatialHash:
+    def __init__(self, cell_size=96):
+        self.cell_size = cell_size
+        self.cells = {}
+
+    # Remove every item, optionally changing the cell size
+    def clear(self, cell_size=None):
+        if cell_size is not None:
+            self.cell_size = cell_size
+        self.cells.clear()
+
+    # Insert an item covering the circle (x, y, radius)
+    def insert(self, item, x, y, radius):
+        size = self.cell_size
+        first_x = int((x - radius) // size)
+        last_x = int((x + radius) // size)
+        first_y = int((y - radius) // size)
+        last_y = int((y + radius) // size)
+        for cell_x in range(first_x, last_x + 1):
+            for cell_y in range(first_y, last_y + 1):
+                self.cells.setdefault(cell_key(cell_x, cell_y), []).append(item)
+
+    # Items stored in the cell containing (x, y)
+    def query(self, x, y):
+        return self.cells.get(cell_key(int(x // self.cell_size), int(y // self.cell_size)), ())
+
+    # Cell keys of many points at once
+    def keys_for(self, x, y):
+        cell_x = np.floor_divide(x, self.cell_size).astype(np.int64)
+        cell_y = np.floor_divide(y, self.cell_size).astype(np.int64)
+        return cell_key(cell_x, cell_y)
+
+    # Mask of the points whose cell holds at least one item
+    def occupied_mask(self, keys):
+        if not self.cells:
+            return np.zeros(len(keys), dtype=bool)
+        return np.isin(keys, np.fromiter(self.cells.keys(), dtype=np.int64, count=len(self.cells)))
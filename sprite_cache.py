@@ -0,0 +1,98 @@
+# sprite_cache.py
+import pygame
+from collections import OrderedDict
+
+ROTATION_STEPS = 128  # number of quantized angles per full turn
+MAX_ROTATED_BYTES = 96 * 1024 * 1024  # upper bound of cached rotated pixels, a 128x128 sprite costs 16x a 32x32 one
+
+# Approximate pixel memory of a surface
+def surface_bytes(surface):
+    width, height = surface.get_size()
+    return width * height * surface.get_bytesize()
+
+# Shared cache of rotated sprites, keyed by (source surface, quantized angle)
+class RotationCache:
+    def __init__(self, steps=ROTATION_STEPS, max_bytes=MAX_ROTATED_BYTES):
+        self.steps = steps
+        self.step_angle = 360.0 / steps
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0  # approximate pixel memory of the cached surfaces
+        self.hits = 0
+        self.misses = 0
+
+    # Quantize an angle in degrees to a step index
+    def quantize(self, angle):
+        return int(round(angle / self.step_angle)) % self.steps
+
+    # Get the source surface rotated by angle degrees
+    def get(self, surface, angle):
+        key = (surface, self.quantize(angle))
+        rotated = self.entries.get(key)
+        if rotated is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return rotated
+        self.misses += 1
+        return self._store(key)
+
+    # Rotate every step of a surface ahead of time
+    def prefill(self, surface):
+        for step in range(self.steps):
+            key = (surface, step)
+            if key not in self.entries:
+                self._store(key)
+
+    def _store(self, key):
+        surface, step = key
+        rotated = pygame.transform.rotate(surface, step * self.step_angle)
+        self.entries[key] = rotated
+        self.bytes += surface_bytes(rotated)
+        while self.bytes > self.max_bytes and len(self.entries) > 1:
+            _, evicted = self.entries.popitem(last=False)  # evict the least recently used sprite
+            self.bytes -= surface_bytes(evicted)
+        return rotated
+
+    def clear(self):
+        self.entries.clear()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+# Flyweight cache of tinted sprite variants, rotated frames are shared through a RotationCache
+class TintCache:
+    def __init__(self, rotations):
+        self.rotations = rotations
+        self.variants = {}
+
+    # Get the source surface multiplied by an RGBA tint
+    def get(self, surface, tint):
+        key = (surface, tint)
+        tinted = self.variants.get(key)
+        if tinted is None:
+            tint_surface = pygame.Surface(surface.get_size(), pygame.SRCALPHA)
+            tint_surface.fill(tint)
+            tinted = surface.copy()
+            tinted.blit(tint_surface, (0, 0), special_flags=pygame.BLEND_RGBA_MULT)
+            self.variants[key] = tinted
+        return tinted
+
+    # Get the tinted variant rotated by angle degrees
+    def get_rotated(self, surface, tint, angle):
+        return self.rotations.get(self.get(surface, tint), angle)
+
+    # Build the tinted variant and all of its rotations ahead of time
+    def prefill(self, surface, tint):
+        self.rotations.prefill(self.get(surface, tint))
+
+    def clear(self):
+        self.variants.clear()
+
+# global rotation cache instance
+rotation_cache = RotationCache()
+# global tint cache instance
+tint_cache = TintCache(rotation_cache)
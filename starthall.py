@@ -1,5 +1,9 @@
 # starthall.py
 import pygame
+from collision_map import CollisionMap
+from logger import get_logger
+
+log = get_logger("starthall")
 
 # Define the StartHall class
 class StartHall:
@@ -31,50 +35,72 @@ class StartHall:
         # set the property tree position
         self.grid[self.property_tree_pos[1]][self.property_tree_pos[0]] = 4 # 4 = property tree
 
-    # Draw the hall
-    def draw(self, win, images, camera_offset):
-        offset_x, offset_y = camera_offset
+        # wall bitmap used by every mover in the hall
+        self.collision_map = CollisionMap.from_grid(self)
+
+        # pre-baked hall surface, rebuilt only when the grid changes
+        self._cached_surface = None
+        self._cached_images = None
+        self._last_offset = None
+
+    # Set a single tile, keep the collision map in sync and drop the cached hall surface.
+    # The collision map version changes with it, so flow fields and sight lines built on the hall refresh themselves
+    def set_tile(self, x, y, value):
+        if self.grid[y][x] != value:
+            self.grid[y][x] = value
+            self.collision_map.set_tile(x, y, value == 1)
+            self.invalidate_cache()
+
+    # Drop the cached hall surface so the next draw rebuilds it
+    def invalidate_cache(self):
+        self._cached_surface = None
+        self._last_offset = None
+
+    # Rasterize the whole hall into one surface
+    def _build_surface(self, images):
+        surface = pygame.Surface((self.width * self.tile_size, self.height * self.tile_size))
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert()
+        surface.fill((0, 0, 0))
+
+        missing = set()
+        tile_images = {1: "wall", 0: "floor", 2: "gate_open", 3: "battery_inventory", 4: "property_tree"}
+        fallback_colors = {3: (128, 128, 128), 4: (0, 255, 0)}  # if the image is not found, draw a rectangle instead
 
-        # draw the hall
         for y in range(self.height):
-
-            # draw the walls and floors
             for x in range(self.width):
-                pos = (x * self.tile_size + offset_x, y * self.tile_size + offset_y)
-
-                # wall
-                if self.grid[y][x] == 1:
-                    if "wall" not in images:
-                        print("Warning: 'wall' image not found!")
-                    else:
-                        win.blit(images["wall"], pos)
-                # floor
-                elif self.grid[y][x] == 0:
-                    if "floor" not in images:
-                        print("Warning: 'floor' image not found!")
-                    else:
-                        win.blit(images["floor"], pos)
-
-                # gate
-                elif self.grid[y][x] == 2:
-                    if "gate_open" not in images:
-                        print("Warning: 'gate_open' image not found!")
-                    else:
-                        win.blit(images["gate_open"], pos)
-
-                # battery storage
-                elif self.grid[y][x] == 3:
-                    if "battery_inventory" not in images:
-                        pygame.draw.rect(win, (128, 128, 128), (*pos, self.tile_size, self.tile_size))  # if the image is not found, draw a green rectangle instead
-                    else:
-                        win.blit(images["battery_inventory"], pos)
-
-                # property tree
-                elif self.grid[y][x] == 4:
-                    if "property_tree" not in images:
-                        pygame.draw.rect(win, (0, 255, 0), (*pos, self.tile_size, self.tile_size))
-                    else:
-                        win.blit(images["property_tree"], pos)
+                tile = self.grid[y][x]
+                key = tile_images.get(tile)
+                if key is None:
+                    continue
+                pos = (x * self.tile_size, y * self.tile_size)
+                if key in images:
+                    surface.blit(images[key], pos)
+                elif tile in fallback_colors:
+                    pygame.draw.rect(surface, fallback_colors[tile], (*pos, self.tile_size, self.tile_size))
+                else:
+                    missing.add(key)
+
+        for key in sorted(missing):
+            log.warning("'%s' image not found!", key)
+        return surface
+
+    # Draw the hall, returns the changed rectangles for dirty-rect updates
+    def draw(self, win, images, camera_offset):
+        offset_x, offset_y = camera_offset
+        changed = False
+
+        # the hall never changes after __init__, so it is only rebuilt when the grid or the images change
+        if self._cached_surface is None or self._cached_images is not images:
+            self._cached_surface = self._build_surface(images)
+            self._cached_images = images
+            changed = True
+
+        rect = win.blit(self._cached_surface, (offset_x, offset_y))
+        if changed or self._last_offset != (offset_x, offset_y):
+            self._last_offset = (offset_x, offset_y)
+            return [rect]
+        return []
 
     # Check if the player is interacting with the gate
     def check_gate_interaction(self, player, keys):
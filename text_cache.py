@@ -0,0 +1,45 @@
+# text_cache.py
+from collections import OrderedDict
+
+MAX_TEXT_SURFACES = 512  # upper bound of cached text surfaces
+
+# LRU cache of rendered text surfaces, keyed by (font, string, color, antialias)
+class TextCache:
+    def __init__(self, max_size=MAX_TEXT_SURFACES):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    # Same arguments as pygame.font.Font.render, but reuses surfaces rendered before
+    def render(self, font, text, antialias, color, background=None):
+        key = (font, text, tuple(color), antialias, None if background is None else tuple(background))
+        surface = self.entries.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return surface
+        self.misses += 1
+        if background is None:
+            surface = font.render(text, antialias, color)
+        else:
+            surface = font.render(text, antialias, color, background)
+        self.entries[key] = surface
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)  # evict the least recently used text
+        return surface
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self.entries), "hit_rate": self.hit_rate()}
+
+# global text cache instance
+text_cache = TextCache()
@@ -0,0 +1,51 @@
+# timer_wheel.py
+
+WHEEL_SLOT_MS = 50  # time covered by one slot (ms)
+WHEEL_SLOTS = 64  # slots per revolution, longer timers stay in their slot for extra turns
+
+# Hashed timer wheel: scheduling and expiry are O(1) per timer instead of scanning every pending timer
+class TimerWheel:
+    def __init__(self, start_time=0, slot_ms=WHEEL_SLOT_MS, slots=WHEEL_SLOTS):
+        self.slot_ms = slot_ms
+        self.slots = [[] for _ in range(slots)]
+        self.current_tick = start_time // slot_ms  # last slot already processed
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    # Fire item once time reaches due_time (ms), at most one slot late
+    def schedule(self, due_time, item):
+        # 向上取整，到达这个槽时一定已经到期，只有多圈的定时器会留在槽里
+        tick = max(-(-due_time // self.slot_ms), self.current_tick + 1)
+        self.slots[tick % len(self.slots)].append((due_time, item))
+        self.count += 1
+
+    # Items whose time has come, in slot order
+    def advance(self, now):
+        target_tick = now // self.slot_ms
+        if target_tick <= self.current_tick:
+            return []
+        expired = []
+        slot_count = len(self.slots)
+        # 超过一圈时每个槽只需看一次
+        last_tick = min(target_tick, self.current_tick + slot_count)
+        for tick in range(self.current_tick + 1, last_tick + 1):
+            slot = self.slots[tick % slot_count]
+            if not slot:
+                continue
+            waiting = []
+            for entry in slot:
+                if entry[0] <= now:
+                    expired.append(entry[1])
+                else:
+                    waiting.append(entry)
+            slot[:] = waiting
+        self.current_tick = target_tick
+        self.count -= len(expired)
+        return expired
+
+    def clear(self):
+        for slot in self.slots:
+            slot.clear()
+        self.count = 0
@@ -1,13 +1,50 @@
 # world.py
+import math
 import random
+import zlib
+import numpy as np
 import pygame
+from pathfinding import RoomGraph
+from collision_map import CollisionMap
+from occupancy import OccupancyTable
+from logger import get_logger
+
+log = get_logger("world")
+
+# region ids used by the render cache
+REGION_NONE = 0
+REGION_WALL = 1
+REGION_CORRIDOR = 2
+REGION_ROOM = 3
+REGION_SQUARE = 4
+REGION_SAFE_SQUARE = 5
+REGION_EVENT = 6
+
+REGION_COLORS = {
+    REGION_WALL: (64, 64, 64),
+    REGION_CORRIDOR: (0, 128, 128),
+    REGION_ROOM: (0, 255, 0),
+    REGION_SQUARE: (0, 128, 128),
+    REGION_SAFE_SQUARE: (0, 255, 255),
+    REGION_EVENT: (255, 255, 0),
+}
+
+CHUNK_TILES = 16  # chunk edge length in tiles
+MAX_CACHED_SCALES = 4  # number of zoom levels kept in memory
+SCALE_STEPS = 64  # zoom levels are rounded to multiples of 1/64 before drawing and caching
+GENERATOR_VERSION = 1  # bump whenever the same seed would generate a different level, old cached levels are then ignored
 
 class World:
-    def __init__(self, tile_size=32):
+    def __init__(self, tile_size=32, rng=None, width=180, height=101, room_padding=0, generate=True, seed=None):
         self.tile_size = tile_size
-        self.width = 180
-        self.height = 101
-        self.grid = [[1 for _ in range(self.width)] for _ in range(self.height)]
+        if rng is None and seed is not None:
+            rng = random.Random(seed)
+        self.rng = rng if rng is not None else random  # pass a seed or a seeded random.Random for reproducible levels
+        self.seed = seed  # None when the level came from an rng that was passed in
+        self.width = width
+        self.height = height
+        self.room_padding = room_padding  # free tiles kept around every room and square
+        self.grid = np.ones((self.height, self.width), dtype=np.uint8)  # 1 = wall, 0 = floor, 2 = event point; grid[y][x] still works
         self.rooms = []
         self.squares = []
         self.event_points = []
@@ -15,25 +52,78 @@ class World:
         self.item_spawn_points = []
         self.battery_spawn_points = []
         self.teleport_points = []
-        
+        self.region_grid = None
+        self.region_ids = None
+        self._chunk_cache = {}  # scale -> {(chunk_x, chunk_y): (tile surface, overlay surface)}
+        self.room_graph = None  # hierarchical navigation, built on the first path query
+        self.collision_map = None
+        self.occupancy = OccupancyTable(self.width, self.height)
+        if generate:
+            self.generate()
+
+    def generate(self):
+        """Generate the whole level into the empty grid"""
         self.generate_rooms()
         self.generate_squares()
         self.generate_corridors()
         self.generate_event_points()
         self.generate_spawn_points()
+        self.build_region_grid()
+        self.collision_map = CollisionMap.from_grid(self)
 
-        print(f"Number of rooms generated: {len(self.rooms)}")
-        print(f"Rooms' details: {self.rooms}")
-        print(f"Number of squares generated: {len(self.squares)}")
-        print(f"Squares' details: {self.squares}")
-        print(f"Number of event points generated: {len(self.event_points)}")
+        log.info("Number of rooms generated: %d", len(self.rooms))
+        log.debug("Rooms' details: %s", self.rooms)
+        log.info("Number of squares generated: %d", len(self.squares))
+        log.debug("Squares' details: %s", self.squares)
+        log.info("Number of event points generated: %d", len(self.event_points))
+
+    def snapshot(self):
+        """Picklable copy of the generated level: the zlib-compressed grid plus room and spawn metadata"""
+        return {
+            "tile_size": self.tile_size,
+            "width": self.width,
+            "height": self.height,
+            "room_padding": self.room_padding,
+            "grid": zlib.compress(self.grid.tobytes(), 1),
+            "rooms": self.rooms,
+            "squares": self.squares,
+            "event_points": self.event_points,
+            "enemy_spawn_points": self.enemy_spawn_points,
+            "item_spawn_points": self.item_spawn_points,
+            "battery_spawn_points": self.battery_spawn_points,
+            "teleport_points": self.teleport_points,
+            "seed": self.seed,
+            "rng_state": self.rng.getstate(),  # later draws (start position) match the generating world
+        }
+
+    @classmethod
+    def from_snapshot(cls, data, rng=None):
+        """Rebuild a world from snapshot() without generating it again"""
+        world = cls(data["tile_size"], rng if rng is not None else random.Random(), data["width"], data["height"],
+                    data["room_padding"], generate=False)
+        world.seed = data.get("seed")
+        world.grid = np.frombuffer(zlib.decompress(data["grid"]), dtype=np.uint8).reshape(world.height, world.width).copy()
+        world.rooms = list(data["rooms"])
+        world.squares = list(data["squares"])
+        world.event_points = list(data["event_points"])
+        world.enemy_spawn_points = list(data["enemy_spawn_points"])
+        world.item_spawn_points = list(data["item_spawn_points"])
+        world.battery_spawn_points = list(data["battery_spawn_points"])
+        world.teleport_points = list(data["teleport_points"])
+        if data.get("rng_state") is not None:
+            world.rng.setstate(data["rng_state"])
+        for x, y, w, h, _ in world.rooms + world.squares:
+            world.occupancy.mark(x, y, w, h)
+        world.build_region_grid()
+        world.collision_map = CollisionMap.from_grid(world)
+        return world
 
     def generate_rooms(self):
-        num_rooms = random.randint(15, 20)
+        num_rooms = self.rng.randint(15, 20)
         room_types = ["small"] * (int(num_rooms * 0.4)) + \
                      ["medium"] * (int(num_rooms * 0.4)) + \
                      ["large"] * (num_rooms - int(num_rooms * 0.8))
-        random.shuffle(room_types)
+        self.rng.shuffle(room_types)
 
         for room_type in room_types:
             if room_type == "small":
@@ -43,64 +133,44 @@ class World:
             else:
                 w, h = 15, 15
 
-            for _ in range(200):
-                x = random.randint(1, self.width - w - 1)
-                y = random.randint(1, self.height - h - 1)
-                overlap = False
-                for rx, ry, rw, rh, _ in self.rooms + self.squares:
-                    if (x < rx + rw and x + w > rx and
-                        y < ry + rh and y + h > ry):
-                        overlap = True
-                        print(f"Room {room_type} overlaps at ({x}, {y}), trying new position")
-                        break
-                if not overlap:
-                    self.rooms.append((x, y, w, h, room_type))
-                    for ry in range(y, y + h):
-                        for rx in range(x, x + w):
-                            self.grid[ry][rx] = 0
-                    print(f"Successfully placed {room_type} room at ({x}, {y})")
-                    break
-                if _ == 199:
-                    print(f"Warning: Failed to place {room_type} room after 200 attempts")
+            position = self.find_free_position(w, h)
+            if position is None:
+                log.warning("Failed to place %s room, no free position left", room_type)
+                continue
+            x, y = position
+            self.rooms.append((x, y, w, h, room_type))
+            self.grid[y:y + h, x:x + w] = 0
+            log.debug("Successfully placed %s room at (%d, %d)", room_type, x, y)
 
     def generate_squares(self):
         square_types = ["safe", "resource", "battle"]
         for square_type in square_types:
             w, h = 20, 20
-            for _ in range(200):
-                x = random.randint(1, self.width - w - 1)
-                y = random.randint(1, self.height - h - 1)
-                overlap = False
-                for rx, ry, rw, rh, _ in self.rooms + self.squares:
-                    if (x < rx + rw and x + w > rx and
-                        y < ry + rh and y + h > ry):
-                        overlap = True
-                        break
-                if not overlap:
-                    self.squares.append((x, y, w, h, square_type))
-                    for ry in range(y, y + h):
-                        for rx in range(x, x + w):
-                            self.grid[ry][rx] = 0
-                    print(f"Successfully placed {square_type} square at ({x}, {y})")
-                    break
-                if _ == 199:
-                    print(f"Warning: Failed to place {square_type} square after 200 attempts")
+            position = self.find_free_position(w, h)
+            if position is None:
+                log.warning("Failed to place %s square, no free position left", square_type)
+                continue
+            x, y = position
+            self.squares.append((x, y, w, h, square_type))
+            self.grid[y:y + h, x:x + w] = 0
+            log.debug("Successfully placed %s square at (%d, %d)", square_type, x, y)
+
+    def find_free_position(self, w, h):
+        """Pick a random top-left tile where a w x h area overlaps no room or square, None if there is none"""
+        max_x = self.width - w - 1
+        max_y = self.height - h - 1
+        if max_x < 1 or max_y < 1:
+            return None
+        return self.occupancy.place(self.rng, w, h, self.room_padding, 1, 1, max_x, max_y)
 
     def generate_corridors(self):
         centers = [(x + w // 2, y + h // 2) for x, y, w, h, _ in self.rooms + self.squares]
-        random.shuffle(centers)
+        self.rng.shuffle(centers)
 
+        # 2格宽的L形走廊：先沿y1横向，再沿x2纵向（切片下界要截到0，负数会从末尾取）
         def carve_corridor(x1, y1, x2, y2):
-            for x in range(min(x1, x2), max(x1, x2) + 1):
-                for dy in range(-1, 1):
-                    ny = y1 + dy
-                    if 0 <= ny < self.height and 0 <= x < self.width:
-                        self.grid[ny][x] = 0
-            for y in range(min(y1, y2), max(y1, y2) + 1):
-                for dx in range(-1, 1):
-                    nx = x2 + dx
-                    if 0 <= nx < self.width and 0 <= y < self.height:
-                        self.grid[y][nx] = 0
+            self.grid[max(0, y1 - 1):y1 + 1, max(0, min(x1, x2)):max(x1, x2) + 1] = 0
+            self.grid[max(0, min(y1, y2)):max(y1, y2) + 1, max(0, x2 - 1):x2 + 1] = 0
 
         for i in range(len(centers) - 1):
             x1, y1 = centers[i]
@@ -109,28 +179,34 @@ class World:
 
         # 添加分支走廊
         for x, y, w, h, _ in self.rooms + self.squares:
-            if random.random() < 0.25:
-                branch_x = x + random.randint(0, w - 1)
-                branch_y = y + random.randint(0, h - 1)
-                length = random.randint(4, 8)
-                direction = random.choice([(1, 0), (-1, 0), (0, 1), (0, -1)])
-                for i in range(length):
-                    nx = branch_x + direction[0] * i
-                    ny = branch_y + direction[1] * i
-                    if 0 <= nx < self.width and 0 <= ny < self.height:
-                        for dy in range(-1, 1):
-                            for dx in range(-1, 1):
-                                if 0 <= nx + dx < self.width and 0 <= ny + dy < self.height:
-                                    self.grid[ny + dy][nx + dx] = 0
+            if self.rng.random() < 0.25:
+                branch_x = x + self.rng.randint(0, w - 1)
+                branch_y = y + self.rng.randint(0, h - 1)
+                length = self.rng.randint(4, 8)
+                direction = self.rng.choice([(1, 0), (-1, 0), (0, 1), (0, -1)])
+                # 分支上每个格子清出左上方2x2，合起来就是一个矩形
+                steps = [(branch_x + direction[0] * i, branch_y + direction[1] * i) for i in range(length)]
+                steps = [(nx, ny) for nx, ny in steps if 0 <= nx < self.width and 0 <= ny < self.height]
+                if steps:
+                    xs = [nx for nx, _ in steps]
+                    ys = [ny for _, ny in steps]
+                    self.grid[max(0, min(ys) - 1):max(ys) + 1, max(0, min(xs) - 1):max(xs) + 1] = 0
 
     def generate_event_points(self):
-        for x in range(1, self.width - 1):
-            for y in range(1, self.height - 1):
-                if self.grid[y][x] == 0:
-                    wall_count = sum(self.grid[y + dy][x + dx] for dy in [-1, 0, 1] for dx in [-1, 0, 1])
-                    if wall_count >= 4 and random.random() < 0.1:
-                        self.grid[y][x] = 2
-                        self.event_points.append((x, y))
+        # 3x3盒式滤波统计每个内部格子周围的墙数
+        grid = self.grid
+        height, width = grid.shape
+        wall_count = np.zeros((height - 2, width - 2), dtype=np.int32)
+        for dy in range(3):
+            for dx in range(3):
+                wall_count += grid[dy:dy + height - 2, dx:dx + width - 2]
+        candidates = (grid[1:-1, 1:-1] == 0) & (wall_count >= 4)
+        noise = np.random.default_rng(self.rng.getrandbits(64))
+        chosen = candidates & (noise.random(candidates.shape) < 0.1)
+        grid[1:-1, 1:-1][chosen] = 2
+        # 按x再按y的顺序记录，与逐列扫描的结果顺序一致
+        xs, ys = np.nonzero(chosen.T)
+        self.event_points = [(int(x) + 1, int(y) + 1) for x, y in zip(xs, ys)]
 
     def generate_spawn_points(self):
         # 生成敌人出生点
@@ -138,26 +214,26 @@ class World:
             if room_type in ["medium", "large"]:
                 num_spawns = 2 if room_type == "medium" else 4
                 for _ in range(num_spawns):
-                    spawn_x = x + random.randint(1, w - 2)
-                    spawn_y = y + random.randint(1, h - 2)
+                    spawn_x = x + self.rng.randint(1, w - 2)
+                    spawn_y = y + self.rng.randint(1, h - 2)
                     self.enemy_spawn_points.append((spawn_x, spawn_y))
 
         # 生成物品出生点
         for x, y, w, h, square_type in self.squares:
             if square_type == "resource":
-                num_items = random.randint(3, 5)
+                num_items = self.rng.randint(3, 5)
                 for _ in range(num_items):
-                    item_x = x + random.randint(1, w - 2)
-                    item_y = y + random.randint(1, h - 2)
+                    item_x = x + self.rng.randint(1, w - 2)
+                    item_y = y + self.rng.randint(1, h - 2)
                     self.item_spawn_points.append((item_x, item_y))
 
         # 生成电池出生点
         for x, y, w, h, room_type in self.rooms:
             if room_type == "large":
-                num_batteries = random.randint(2, 3)
+                num_batteries = self.rng.randint(2, 3)
                 for _ in range(num_batteries):
-                    battery_x = x + random.randint(1, w - 2)
-                    battery_y = y + random.randint(1, h - 2)
+                    battery_x = x + self.rng.randint(1, w - 2)
+                    battery_y = y + self.rng.randint(1, h - 2)
                     self.battery_spawn_points.append((battery_x, battery_y))
 
         # 生成传送点
@@ -167,89 +243,185 @@ class World:
                 teleport_y = y + h // 2
                 self.teleport_points.append((teleport_x, teleport_y))
 
+    def corridor_mask(self, x, y):
+        """Which of many world positions (pixels) lie on corridor tiles, bullets there are removed"""
+        if self.region_ids is None:
+            self.build_region_grid()
+        tile_x = np.floor_divide(x, self.tile_size).astype(np.intp)
+        tile_y = np.floor_divide(y, self.tile_size).astype(np.intp)
+        inside = (tile_x >= 0) & (tile_x < self.width) & (tile_y >= 0) & (tile_y < self.height)
+        mask = np.zeros(inside.shape, dtype=bool)
+        mask[inside] = self.region_ids[tile_y[inside], tile_x[inside]] == REGION_CORRIDOR
+        return mask
+
     def is_wall(self, x, y):
         if 0 <= x < self.width and 0 <= y < self.height:
-            return self.grid[y][x] == 1
+            return self.grid[y, x] == 1
         return True
     
+    def find_path(self, start, goal):
+        """Tile path between two tiles, routed over the room graph between rooms and squares"""
+        if self.room_graph is None:
+            self.room_graph = RoomGraph(self)
+        return self.room_graph.find_path(start, goal)
+
     def get_start_position(self):
         small_rooms = [(x, y, w, h) for x, y, w, h, t in self.rooms if t == "small"]
         if not small_rooms:
-            print("Warning: No small rooms found, using default position")
+            log.warning("No small rooms found, using default position")
             return self.width * self.tile_size // 2, self.height * self.tile_size // 2
 
-        left_top_rooms = [(x, y, w, h) for x, y, w, h in small_rooms if x < 90 and y < 50]
-        right_bottom_rooms = [(x, y, w, h) for x, y, w, h in small_rooms if x >= 90 and y >= 50]
+        half_width = self.width // 2
+        half_height = self.height // 2
+        left_top_rooms = [(x, y, w, h) for x, y, w, h in small_rooms if x < half_width and y < half_height]
+        right_bottom_rooms = [(x, y, w, h) for x, y, w, h in small_rooms if x >= half_width and y >= half_height]
 
         if left_top_rooms:
-            x, y, w, h = random.choice(left_top_rooms)
-            print(f"Player start position: Top-left small room ({x}, {y})")
+            x, y, w, h = self.rng.choice(left_top_rooms)
+            log.info("Player start position: Top-left small room (%d, %d)", x, y)
         elif right_bottom_rooms:
-            x, y, w, h = random.choice(right_bottom_rooms)
-            print(f"Player start position: Bottom-right small room ({x}, {y})")
+            x, y, w, h = self.rng.choice(right_bottom_rooms)
+            log.info("Player start position: Bottom-right small room (%d, %d)", x, y)
         else:
-            x, y, w, h = random.choice(small_rooms)
-            print(f"Warning: No top-left or bottom-right small rooms found, using random small room ({x}, {y})")
+            x, y, w, h = self.rng.choice(small_rooms)
+            log.warning("No top-left or bottom-right small rooms found, using random small room (%d, %d)", x, y)
 
         center_x = x + w // 2
         center_y = y + h // 2
         attempts = 0
         while self.grid[center_y][center_x] != 0 and attempts < 10:
-            print(f"Center position ({center_x}, {center_y}) is a wall, trying to adjust")
-            new_x = random.randint(x, x + w - 1)
-            new_y = random.randint(y, y + h - 1)
+            log.debug("Center position (%d, %d) is a wall, trying to adjust", center_x, center_y)
+            new_x = self.rng.randint(x, x + w - 1)
+            new_y = self.rng.randint(y, y + h - 1)
             center_x, center_y = new_x, new_y
             attempts += 1
 
         if self.grid[center_y][center_x] != 0:
-            print("Warning: Could not find non-wall start position, using room center")
+            log.warning("Could not find non-wall start position, using room center")
         
         return center_x * self.tile_size, center_y * self.tile_size
 
-    def draw(self, win, camera_offset, scale=1.0):
-        offset_x, offset_y = camera_offset
-        for y in range(self.height):
-            for x in range(self.width):
-                pos = (int(x * self.tile_size * scale + offset_x),
-                       int(y * self.tile_size * scale + offset_y))
-                size = int(self.tile_size * scale)
-                if self.grid[y][x] == 1:
-                    pygame.draw.rect(win, (64, 64, 64), (*pos, size, size))
-                elif self.grid[y][x] == 0:
-                    color = (0, 128, 128)
-                    for rx, ry, rw, rh, rtype in self.rooms:
-                        if rx <= x < rx + rw and ry <= y < ry + rh:
-                            color = (0, 255, 0)
-                            break
-                    for sx, sy, sw, sh, stype in self.squares:
-                        if sx <= x < sx + sw and sy <= y < sy + sh:
-                            color = (0, 255, 255) if stype == "safe" else (0, 128, 128)
-                            break
-                    pygame.draw.rect(win, color, (*pos, size, size))
-                elif self.grid[y][x] == 2:
-                    pygame.draw.rect(win, (255, 255, 0), (*pos, size, size))
-                pygame.draw.rect(win, (50, 50, 50), (*pos, size, size), 1)
-
-        # 绘制出生点
-        for x, y in self.enemy_spawn_points:
-            pos = (int(x * self.tile_size * scale + offset_x),
-                   int(y * self.tile_size * scale + offset_y))
-            pygame.draw.circle(win, (255, 0, 0), pos, int(4 * scale))
-
-        for x, y in self.item_spawn_points:
-            pos = (int(x * self.tile_size * scale + offset_x),
-                   int(y * self.tile_size * scale + offset_y))
-            pygame.draw.circle(win, (0, 255, 0), pos, int(4 * scale))
-
-        for x, y in self.battery_spawn_points:
-            pos = (int(x * self.tile_size * scale + offset_x),
-                   int(y * self.tile_size * scale + offset_y))
-            pygame.draw.circle(win, (255, 255, 0), pos, int(4 * scale))
-
-        for x, y in self.teleport_points:
-            pos = (int(x * self.tile_size * scale + offset_x),
-                   int(y * self.tile_size * scale + offset_y))
-            pygame.draw.circle(win, (0, 0, 255), pos, int(6 * scale))
+    def build_region_grid(self):
+        """Compute the region id of every tile once, so drawing never scans rooms again"""
+        grid = self.grid
+        region_grid = np.full(grid.shape, REGION_NONE, dtype=np.uint8)
+        region_grid[grid == 1] = REGION_WALL
+        region_grid[grid == 0] = REGION_CORRIDOR
+        region_grid[grid == 2] = REGION_EVENT
+        for x, y, w, h, _ in self.rooms:
+            region_grid[y:y + h, x:x + w][grid[y:y + h, x:x + w] == 0] = REGION_ROOM
+        for x, y, w, h, square_type in self.squares:
+            region = REGION_SAFE_SQUARE if square_type == "safe" else REGION_SQUARE
+            region_grid[y:y + h, x:x + w][grid[y:y + h, x:x + w] == 0] = region
+        self.region_ids = region_grid  # numpy copy for vectorized lookups
+        self.region_grid = region_grid.tolist()  # chunk rendering reads single tiles, plain lists are faster there
+        self.invalidate_render_cache()
+
+    def invalidate_render_cache(self):
+        """Drop every pre-rendered chunk, call this after changing the grid"""
+        self._chunk_cache.clear()
+
+    def _spawn_markers(self):
+        markers = [((255, 0, 0), 4, point) for point in self.enemy_spawn_points]
+        markers += [((0, 255, 0), 4, point) for point in self.item_spawn_points]
+        markers += [((255, 255, 0), 4, point) for point in self.battery_spawn_points]
+        markers += [((0, 0, 255), 6, point) for point in self.teleport_points]
+        return markers
+
+    def _get_scale_cache(self, scale):
+        if scale in self._chunk_cache:
+            # move to the end so the least recently used scale is evicted first
+            chunks = self._chunk_cache.pop(scale)
+            self._chunk_cache[scale] = chunks
+            return chunks
+        if len(self._chunk_cache) >= MAX_CACHED_SCALES:
+            del self._chunk_cache[next(iter(self._chunk_cache))]
+        chunks = {}
+        self._chunk_cache[scale] = chunks
+        return chunks
+
+    @staticmethod
+    def quantize_scale(scale):
+        """Zoom level actually used for drawing: a multiple of 1 / SCALE_STEPS, so cache keys repeat exactly.
+        Draw anything that has to line up with the walls at this scale too"""
+        return max(1, round(scale * SCALE_STEPS)) / SCALE_STEPS
+
+    def _tile_edges(self, first, count, scale):
+        # 每条格子边界都由世界坐标取整得到，非整数缩放下也不会累积误差
+        tile_px = self.tile_size * scale
+        return [round((first + i) * tile_px) for i in range(count + 1)]
+
+    def _render_chunk(self, chunk_x, chunk_y, scale):
+        x0 = chunk_x * CHUNK_TILES
+        y0 = chunk_y * CHUNK_TILES
+        cols = min(CHUNK_TILES, self.width - x0)
+        rows = min(CHUNK_TILES, self.height - y0)
+        xs = self._tile_edges(x0, cols, scale)
+        ys = self._tile_edges(y0, rows, scale)
+        chunk_left, chunk_top = xs[0], ys[0]
+        size = (xs[-1] - chunk_left, ys[-1] - chunk_top)
+
+        tiles = pygame.Surface(size)
+        if pygame.display.get_surface() is not None:
+            tiles = tiles.convert()
+        for y in range(rows):
+            region_row = self.region_grid[y0 + y]
+            top = ys[y] - chunk_top
+            height = ys[y + 1] - ys[y]
+            for x in range(cols):
+                rect = (xs[x] - chunk_left, top, xs[x + 1] - xs[x], height)
+                color = REGION_COLORS.get(region_row[x0 + x])
+                if color is not None:
+                    tiles.fill(color, rect)
+                pygame.draw.rect(tiles, (50, 50, 50), rect, 1)
+
+        # spawn markers go to a separate overlay so neighbouring chunks never paint over them
+        overlay = None
+        tile_px = self.tile_size * scale
+        for color, radius, (mx, my) in self._spawn_markers():
+            r = int(radius * scale)
+            px = round(mx * tile_px) - chunk_left
+            py = round(my * tile_px) - chunk_top
+            if -r <= px < size[0] + r and -r <= py < size[1] + r:
+                if overlay is None:
+                    overlay = pygame.Surface(size, pygame.SRCALPHA)
+                pygame.draw.circle(overlay, color, (px, py), r)
+        return tiles, overlay
+
+    def draw(self, win, camera_offset, scale=1.0, camera=None):
+        if self.region_grid is None:
+            self.build_region_grid()
+        offset_x, offset_y = int(camera_offset[0]), int(camera_offset[1])
+        scale = self.quantize_scale(scale)
+        chunk_px = CHUNK_TILES * self.tile_size * scale  # float, chunk origins are rounded from it
+        chunks = self._get_scale_cache(scale)
+
+        # only the chunks that intersect the viewport
+        view_width, view_height = win.get_size()
+        chunks_x = (self.width + CHUNK_TILES - 1) // CHUNK_TILES
+        chunks_y = (self.height + CHUNK_TILES - 1) // CHUNK_TILES
+        first_x = max(0, math.floor(-offset_x / chunk_px))
+        first_y = max(0, math.floor(-offset_y / chunk_px))
+        last_x = min(chunks_x - 1, math.floor((view_width - 1 - offset_x) / chunk_px))
+        last_y = min(chunks_y - 1, math.floor((view_height - 1 - offset_y) / chunk_px))
+        if camera is not None:
+            visible_chunks = max(0, last_x - first_x + 1) * max(0, last_y - first_y + 1)
+            camera.count("world chunks", visible_chunks, chunks_x * chunks_y - visible_chunks)
+
+        visible = []
+        for chunk_y in range(first_y, last_y + 1):
+            for chunk_x in range(first_x, last_x + 1):
+                key = (chunk_x, chunk_y)
+                if key not in chunks:
+                    chunks[key] = self._render_chunk(chunk_x, chunk_y, scale)
+                pos = (round(chunk_x * chunk_px) + offset_x, round(chunk_y * chunk_px) + offset_y)
+                visible.append((chunks[key], pos))
+
+        for (tiles, _), pos in visible:
+            win.blit(tiles, pos)
+        for (_, overlay), pos in visible:
+            if overlay is not None:
+                win.blit(overlay, pos)
 
 if __name__ == "__main__":
     pygame.init()
@@ -1,6 +1,11 @@
 # world_beta.py
 import pygame
 import os
+from region_index import RegionIndex
+from spatial_hash import SpatialHash
+from constants import CORRIDOR_WIDTH
+
+TELEPORT_TRIGGER_DISTANCE = 50  # 传送触发距离
 
 class WorldBeta:
     def __init__(self, screen_width, screen_height):
@@ -13,7 +18,7 @@ class WorldBeta:
         self.level_height = screen_height * 3
         
         # 走廊尺寸
-        self.corridor_width = 200  # 走廊宽度
+        self.corridor_width = CORRIDOR_WIDTH  # 走廊宽度
         self.corridor_height = screen_height * 3  # 走廊高度
         
         # 关卡位置（沿X轴排列）
@@ -168,6 +173,17 @@ class WorldBeta:
                 "target_y": self.corridor_height // 2
             }
         }
+
+        # 区域索引和按格子分桶的传送点，查询时不再遍历全部
+        self.region_index = RegionIndex()
+        for level_name, level in self.levels.items():
+            self.region_index.add(level_name, level["x"], level["y"], level["x"] + level["width"], level["y"] + level["height"])
+        for corridor_name, corridor in self.corridors.items():
+            self.region_index.add(corridor_name, corridor["x"], corridor["y"],
+                                  corridor["x"] + corridor["width"], corridor["y"] + corridor["height"])
+        self.teleport_hash = SpatialHash(TELEPORT_TRIGGER_DISTANCE * 2)
+        for point in self.teleport_points.values():
+            self.teleport_hash.insert(point, point["x"], point["y"], TELEPORT_TRIGGER_DISTANCE)
     
     def get_level(self, level_name):
         """获取指定关卡的信息"""
@@ -183,20 +199,14 @@ class WorldBeta:
     
     def check_teleport(self, player_x, player_y):
         """检查玩家是否在传送点附近"""
-        for point_name, point in self.teleport_points.items():
-            distance = ((player_x - point["x"]) ** 2 + (player_y - point["y"]) ** 2) ** 0.5
-            if distance < 50:  # 传送触发距离
+        trigger_distance_sq = TELEPORT_TRIGGER_DISTANCE * TELEPORT_TRIGGER_DISTANCE
+        for point in self.teleport_hash.query(player_x, player_y):
+            dx = player_x - point["x"]
+            dy = player_y - point["y"]
+            if dx * dx + dy * dy < trigger_distance_sq:
                 return point
         return None
     
     def get_current_area(self, player_x, player_y):
         """获取玩家当前所在的区域（关卡或走廊）"""
-        for level_name, level in self.levels.items():
-            if (level["x"] <= player_x <= level["x"] + level["width"] and
-                level["y"] <= player_y <= level["y"] + level["height"]):
-                return level_name
-        for corridor_name, corridor in self.corridors.items():
-            if (corridor["x"] <= player_x <= corridor["x"] + corridor["width"] and
-                corridor["y"] <= player_y <= corridor["y"] + corridor["height"]):
-                return corridor_name
-        return None 
\ No newline at end of file
+        return self.region_index.lookup(player_x, player_y)
@@ -0,0 +1,182 @@
+# world_cache.py
+import hashlib
+import mmap
+import os
+import struct
+import zlib
+import numpy as np
+from world import World, GENERATOR_VERSION
+from logger import get_logger
+
+log = get_logger("world_cache")
+
+WORLD_CACHE_DIR = "world_cache"  # generated levels stored by seed
+FORMAT_MAGIC = b"Z2HW"
+FORMAT_VERSION = 1  # bump when the byte layout below changes
+GRID_COMPRESS_LEVEL = 6
+
+ROOM_TYPES = ("small", "medium", "large", "safe", "resource", "battle")  # room and square types by code
+POINT_LISTS = ("event_points", "enemy_spawn_points", "item_spawn_points", "battery_spawn_points", "teleport_points")
+
+# header: magic, format version, generator version, flags, seed, tile size, width, height, room padding,
+# compressed grid size, then the number of rooms, squares and of every point list
+HEADER = struct.Struct("<4sHHHQHHHHI7I")
+RNG_STATE = struct.Struct("<I625Id")  # random.Random state: version, 625 state words, pending gauss value
+
+FLAG_SEED = 1  # the seed field is valid
+FLAG_RNG_STATE = 2  # an rng state block follows the header
+FLAG_GAUSS = 4  # the rng state has a pending gauss value
+
+# Seed as stored in headers and file names: unsigned 64-bit ints stay as they are, anything else
+# (daily seed strings, negative or larger ints) becomes a stable 64-bit hash of its type and value
+def normalize_seed(seed):
+    if type(seed) is int and 0 <= seed < 1 << 64:
+        return seed
+    digest = hashlib.blake2b(f"{type(seed).__name__}:{seed}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+# Encode a World.snapshot() as bytes: header, optional rng state, zlib grid, then int16 arrays.
+# Rooms and squares are (x, y, w, h, type code) rows, points are (x, y) rows.
+def encode_snapshot(data):
+    flags = 0
+    seed = data.get("seed")
+    if seed is None:
+        seed = 0
+    elif type(seed) is int and 0 <= seed < 1 << 64:
+        flags |= FLAG_SEED
+    else:
+        raise ValueError(f"world seed {seed!r} is not an unsigned 64-bit int, generate with normalize_seed()")
+    rng_block = b""
+    rng_state = data.get("rng_state")
+    if rng_state is not None and rng_state[0] == 3 and len(rng_state[1]) == 625:
+        flags |= FLAG_RNG_STATE
+        gauss = rng_state[2]
+        if gauss is not None:
+            flags |= FLAG_GAUSS
+        rng_block = RNG_STATE.pack(rng_state[0], *rng_state[1], gauss or 0.0)
+    grid = zlib.compress(zlib.decompress(data["grid"]), GRID_COMPRESS_LEVEL)
+    rooms = [(x, y, w, h, ROOM_TYPES.index(kind)) for x, y, w, h, kind in data["rooms"]]
+    squares = [(x, y, w, h, ROOM_TYPES.index(kind)) for x, y, w, h, kind in data["squares"]]
+    points = [data[name] for name in POINT_LISTS]
+    header = HEADER.pack(FORMAT_MAGIC, FORMAT_VERSION, GENERATOR_VERSION, flags, seed, data["tile_size"],
+                         data["width"], data["height"], data["room_padding"], len(grid),
+                         len(rooms), len(squares), *(len(point_list) for point_list in points))
+    arrays = [np.array(rooms, dtype="<i2").reshape(-1, 5), np.array(squares, dtype="<i2").reshape(-1, 5)]
+    arrays += [np.array(point_list, dtype="<i2").reshape(-1, 2) for point_list in points]
+    return b"".join([header, rng_block, grid] + [array.tobytes() for array in arrays])
+
+# Decode bytes (or an mmap) from encode_snapshot() back into a snapshot dict, ValueError if they do not match
+def decode_snapshot(buffer):
+    if len(buffer) < HEADER.size:
+        raise ValueError("world snapshot is truncated")
+    (magic, format_version, generator_version, flags, seed, tile_size, width, height, room_padding,
+     grid_size, room_count, square_count, *point_counts) = HEADER.unpack_from(buffer, 0)
+    if magic != FORMAT_MAGIC:
+        raise ValueError("not a world snapshot")
+    if format_version != FORMAT_VERSION:
+        raise ValueError(f"world snapshot format {format_version}, expected {FORMAT_VERSION}")
+    offset = HEADER.size
+    rng_state = None
+    if flags & FLAG_RNG_STATE:
+        values = RNG_STATE.unpack_from(buffer, offset)
+        rng_state = (values[0], values[1:626], values[626] if flags & FLAG_GAUSS else None)
+        offset += RNG_STATE.size
+    grid = bytes(buffer[offset:offset + grid_size])  # stays compressed until World.from_snapshot
+    if len(grid) != grid_size:
+        raise ValueError("world snapshot is truncated")
+    offset += grid_size
+
+    # 用tolist一次转换，不让numpy数组引用mmap的内存
+    def read_rows(count, columns):
+        nonlocal offset
+        rows = np.frombuffer(buffer, dtype="<i2", count=count * columns, offset=offset).reshape(count, columns).tolist()
+        offset += count * columns * 2
+        return rows
+
+    if len(buffer) < offset + (room_count + square_count) * 10 + sum(point_counts) * 4:
+        raise ValueError("world snapshot is truncated")
+    data = {
+        "tile_size": tile_size,
+        "width": width,
+        "height": height,
+        "room_padding": room_padding,
+        "grid": grid,
+        "rooms": [(x, y, w, h, ROOM_TYPES[kind]) for x, y, w, h, kind in read_rows(room_count, 5)],
+        "squares": [(x, y, w, h, ROOM_TYPES[kind]) for x, y, w, h, kind in read_rows(square_count, 5)],
+        "seed": seed if flags & FLAG_SEED else None,
+        "rng_state": rng_state,
+        "generator_version": generator_version,
+    }
+    for name, count in zip(POINT_LISTS, point_counts):
+        data[name] = [tuple(point) for point in read_rows(count, 2)]
+    return data
+
+def encode_world(world):
+    return encode_snapshot(world.snapshot())
+
+def decode_world(buffer, rng=None):
+    return World.from_snapshot(decode_snapshot(buffer), rng)
+
+# Generated levels on disk, one file per (seed, generator version, size).
+# A daily seed or a crash report seed loads in about a millisecond instead of being generated again.
+class WorldCache:
+    def __init__(self, directory=WORLD_CACHE_DIR):
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, seed, tile_size=32, width=180, height=101, room_padding=0):
+        seed = normalize_seed(seed)
+        name = f"world_{seed}_g{GENERATOR_VERSION}_{width}x{height}_t{tile_size}_p{room_padding}.bin"
+        return os.path.join(self.directory, name)
+
+    # Snapshot dict of a cached level, None if it is missing or unreadable
+    def load_snapshot(self, seed, tile_size=32, width=180, height=101, room_padding=0):
+        path = self.path(seed, tile_size, width, height, room_padding)
+        try:
+            with open(path, "rb") as file:
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                    data = decode_snapshot(buffer)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, struct.error, zlib.error) as e:
+            log.warning("Ignoring unreadable cached world %s: %s", path, e)
+            return None
+        if data["generator_version"] != GENERATOR_VERSION:
+            return None
+        return data
+
+    # Write a world generated from a normalized seed, ValueError for any other world
+    def store(self, world):
+        if world.seed is None or world.seed != normalize_seed(world.seed):
+            raise ValueError(f"only worlds generated from normalize_seed() can be cached, got seed {world.seed!r}")
+        data = encode_world(world)
+        path = self.path(world.seed, world.tile_size, world.width, world.height, world.room_padding)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(temp_path, "wb") as file:
+                file.write(data)
+            os.replace(temp_path, path)  # 整个文件一次替换，读到的不会是写了一半的
+        except OSError as e:
+            log.warning("Failed to cache world %s: %s", path, e)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    # Snapshot of the level for a seed, generated and stored on a miss.
+    # The level is generated from normalize_seed(seed), so "2026-10-18" and its cached file always agree
+    def snapshot(self, seed, tile_size=32, width=180, height=101, room_padding=0):
+        seed = normalize_seed(seed)
+        data = self.load_snapshot(seed, tile_size, width, height, room_padding)
+        if data is not None:
+            self.hits += 1
+            return data
+        self.misses += 1
+        world = World(tile_size, None, width, height, room_padding, seed=seed)
+        self.store(world)
+        return world.snapshot()
+
+    # World for a seed, loaded from disk when it was generated before
+    def get(self, seed, tile_size=32, width=180, height=101, room_padding=0, rng=None):
+        return World.from_snapshot(self.snapshot(seed, tile_size, width, height, room_padding), rng)
@@ -0,0 +1,90 @@
+# world_pregen.py
+import multiprocessing
+import random
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from world import World
+from world_cache import WorldCache
+from logger import get_logger
+
+log = get_logger("world_pregen")
+
+PREGEN_READY_WORLDS = 2  # worlds generated ahead, also the bound of the ready queue
+PREGEN_WORKERS = 1  # worker processes, one keeps a core free for the game
+
+# Runs in a worker process: generate one world (or load it from the disk cache) and send back its snapshot
+def generate_world_snapshot(seed, tile_size, width, height, room_padding, cache_dir=None):
+    if cache_dir is not None:
+        return WorldCache(cache_dir).snapshot(seed, tile_size, width, height, room_padding)
+    return World(tile_size, None, width, height, room_padding, seed=seed).snapshot()
+
+# fork 不会重新执行主脚本；其他平台用默认方式，主脚本需要有 __main__ 保护
+def _pool_context():
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return None
+
+# Builds the next worlds in a process pool while the player is still in the start hall.
+# Used through Simulation(world_pregen=...); main.py's gate leads to the fixed main.World layout and does not use it.
+# Every world gets the next seed in order, so a synchronous fallback produces the same level as the pool would have.
+class WorldPregenerator:
+    def __init__(self, seed=None, ready_worlds=PREGEN_READY_WORLDS, workers=PREGEN_WORKERS,
+                 tile_size=32, width=180, height=101, room_padding=0, cache_dir=None):
+        self.seed_rng = random.Random(seed)
+        self.ready_worlds = ready_worlds
+        self.workers = workers
+        self.world_args = (tile_size, width, height, room_padding, cache_dir)  # cache_dir: WorldCache directory, None to always generate
+        self.executor = None
+        self.queue = deque()  # (seed, future) oldest first, at most ready_worlds entries
+        self.hits = 0
+        self.misses = 0
+
+    # Start the worker pool and queue worlds up to the bound
+    def fill(self):
+        if self.executor is None:
+            try:
+                self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=_pool_context())
+            except (OSError, NotImplementedError) as e:
+                log.warning("World pre-generation unavailable, generating on demand: %s", e)
+                self.ready_worlds = 0
+                return
+        while len(self.queue) < self.ready_worlds:
+            seed = self.seed_rng.getrandbits(64)
+            self.queue.append((seed, self.executor.submit(generate_world_snapshot, seed, *self.world_args)))
+
+    # Next world; generated here if the pool has not finished it yet, which counts as a miss
+    def take(self):
+        if self.queue:
+            seed, future = self.queue.popleft()
+        else:
+            seed, future = self.seed_rng.getrandbits(64), None
+        world = None
+        if future is not None and future.done():
+            try:
+                world = World.from_snapshot(future.result(), random.Random())
+                self.hits += 1
+            except Exception as e:  # 进程池出错时退回同步生成
+                log.warning("Pre-generated world failed: %s", e)
+        if world is None:
+            if future is not None:
+                future.cancel()
+            self.misses += 1
+            start = time.perf_counter()
+            world = World.from_snapshot(generate_world_snapshot(seed, *self.world_args), random.Random())
+            log.warning("No pre-generated world ready (%d misses, %d hits), generated in %.1f ms",
+                        self.misses, self.hits, (time.perf_counter() - start) * 1000)
+        log.info("World seed %d", seed)  # 崩溃时可用这个种子重现关卡
+        self.fill()
+        return world
+
+    # Share of take() calls served from the ready queue
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+        self.queue.clear()